@@ -0,0 +1,304 @@
+import os
+
+# everything runs without a window or sound card, set before pygame is imported
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import argparse
+import glob
+import json
+import platform
+import resource
+import sys
+import tempfile
+import numpy as np
+import pygame
+
+if not __package__:
+    # run as a script rather than with python -m benchmarks.bench, game_witcher lives next to this directory
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from time import perf_counter
+from typing import Callable, Dict, List
+from game_witcher.atlas import ATLAS_SPECS, find_atlas, ATLAS_DIRECTORY
+from game_witcher.disk_cache import SpriteDiskCache
+from game_witcher.render import RENDER_SCALES
+from game_witcher.text import TextRenderer
+from game_witcher.utils import AssetCache
+import game_witcher.game as game_module
+
+
+BENCHMARK_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUTPUT = os.path.join(BENCHMARK_DIRECTORY, '..', 'bench_output.json')
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIRECTORY, 'baseline.json')
+# metrics where a larger number is better, everything else is a time or a size
+HIGHER_IS_BETTER = ('ticks_per_s',)
+# quest buckets with fewer ticks than this are merged into 'other', a handful of samples is mostly noise
+MIN_SAMPLES = 50
+# timings that moved by less than this are within timer and scheduler noise, whatever the percentage
+MIN_CHANGE_MS = 0.1
+
+
+def peak_rss_kb() -> int:
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on linux and bytes on macOS
+    return usage // 1024 if sys.platform == 'darwin' else usage
+
+
+def best_of(repeat: int, function: Callable[[], object]) -> float:
+    times = []
+    for _ in range(repeat):
+        start = perf_counter()
+        function()
+        times.append(perf_counter() - start)
+    return min(times)
+
+
+def median_of(repeat: int, function: Callable[[], object]) -> float:
+    times = []
+    for _ in range(repeat):
+        start = perf_counter()
+        function()
+        times.append(perf_counter() - start)
+    return float(np.median(times))
+
+
+def spread(values: List[float]) -> float:
+    # relative range of repeated measurements, how far apart two runs of unchanged code can land
+    middle = float(np.median(values))
+    return (max(values) - min(values)) / middle if middle else 0.0
+
+
+def bench_assets(repeat: int) -> Dict[str, Dict[str, float]]:
+    results = {}
+    for name, size in ATLAS_SPECS.items():
+        directory = os.path.join(game_module.ASSET_DIRECTORY, name)
+        paths = sorted(glob.glob(os.path.join(directory, '*.png')))
+        with tempfile.TemporaryDirectory() as cache_directory:
+            disk_cache = SpriteDiskCache(cache_directory)
+            AssetCache(atlas_directory=None, disk_cache=disk_cache).load_many(paths, size)
+
+            result = {
+                'frames': len(paths),
+                # decode and scale every file, no cache of any kind
+                'cold_ms': best_of(repeat, lambda: AssetCache(atlas_directory=None).load_many(paths, size)) * 1000,
+                'disk_cache_ms': best_of(repeat, lambda: AssetCache(atlas_directory=None, disk_cache=disk_cache)
+                                         .load_many(paths, size)) * 1000,
+            }
+        if find_atlas(directory, ATLAS_DIRECTORY) is not None:
+            result['atlas_ms'] = best_of(repeat, lambda: AssetCache().load_many(paths, size)) * 1000
+
+        cache = AssetCache(atlas_directory=None)
+        cache.load_many(paths, size)
+        result['warm_ms'] = best_of(repeat, lambda: cache.load_many(paths, size)) * 1000
+        result['mirror_ms'] = best_of(repeat, lambda: AssetCache(atlas_directory=None).load_many(paths, size, flip=True)) * 1000
+        results[name] = result
+    return results
+
+
+def quest_phase(game) -> str:
+    if game.end:
+        return 'end'
+    if not game.king.showed:
+        return 'king'
+    if not game.keir.showed:
+        return 'keir'
+    return 'hunt'
+
+
+def quest_policy(game, t: int):
+    # walks the whole quest: King, then Keir in the tavern, then the enemy
+    char = game.char
+    inputs = game_module.Inputs()
+    if char.quest or char.quest_2:
+        inputs.talk = t % 10 == 0
+    elif not game.king.showed:
+        pass
+    elif game.last_r < 2:
+        inputs.right = True
+    elif game.last_r == 2 and not game.keir.showed:
+        if char.x < 700:
+            inputs.right = True
+        else:
+            inputs.tavern = True
+    elif game.last_r == 3 and not game.keir.showed:
+        inputs.left = char.x > 420
+    elif game.last_r == 3:
+        inputs.tavern = True
+    elif game.last_r == 2:
+        inputs.attack = t % 12 == 0
+    return inputs
+
+
+def play_quest(game, ticks: int, measure: Callable) -> Dict[str, List[float]]:
+    # seconds spent by `measure` per "scene/phase" bucket
+    buckets: Dict[str, List[float]] = {}
+    for t in range(ticks):
+        bucket = '{}/{}'.format(game.scenes.current.name, quest_phase(game))
+        buckets.setdefault(bucket, []).append(measure(game, quest_policy(game, t)))
+
+    merged, other = {}, []
+    for bucket, times in buckets.items():
+        if len(times) >= MIN_SAMPLES:
+            merged[bucket] = times
+        else:
+            other += times
+    if len(other) >= MIN_SAMPLES:
+        merged['other'] = other
+    return merged
+
+
+def quest_passes(passes: int, make_game: Callable, ticks: int, measure: Callable,
+                 summarize: Callable[[List[float]], Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+    # the quest bot is deterministic, so every pass fills the same buckets. each metric is the median over passes
+    # and 'noise' holds each metric's spread between passes, which compare adds to its tolerance
+    runs: Dict[str, List[Dict[str, float]]] = {}
+    for _ in range(passes):
+        game = make_game()
+        for bucket, times in play_quest(game, ticks, measure).items():
+            runs.setdefault(bucket, []).append(summarize(times))
+        game.scenes.close()
+
+    results = {}
+    for bucket, summaries in runs.items():
+        values = {name: [summary[name] for summary in summaries] for name in summaries[0]}
+        results[bucket] = {name: float(np.median(value)) for name, value in values.items()}
+        results[bucket]['noise'] = {name: spread(value) for name, value in values.items()}
+    return results
+
+
+def bench_simulation(ticks: int, passes: int) -> Dict[str, Dict[str, float]]:
+    def step(game, inputs):
+        start = perf_counter()
+        game.step(inputs)
+        return perf_counter() - start
+
+    return quest_passes(passes, lambda: game_module.Game(headless=True), ticks, step,
+                        lambda times: {'ticks': len(times), 'ticks_per_s': 1 / float(np.median(times))})
+
+
+def bench_render(ticks: int, repeat: int) -> Dict[str, Dict[str, float]]:
+    def render(game, inputs):
+        game.step(inputs)
+        start = perf_counter()
+        game.render()
+        return perf_counter() - start
+
+    def make_game():
+        game = game_module.Game(headless=False)
+        pygame.mixer.music.stop()
+        return game
+
+    def summarize(times):
+        times = np.array(times) * 1000
+        return {'frames': len(times), 'median_ms': float(np.median(times)), 'p95_ms': float(np.percentile(times, 95))}
+
+    results = quest_passes(repeat, make_game, ticks, render, summarize)
+
+    game = make_game()
+
+    def full_redraw():
+        game.renderer.invalidate()
+        game.render()
+    # warmed up first, so the scaled sprites of each tier are already built
+    for scale in RENDER_SCALES:
+        game.renderer.set_scale(scale)
+        full_redraw()
+        name = 'full_redraw' if scale == 1.0 else 'full_redraw_{:.0f}'.format(scale * 100)
+        times = [median_of(10, full_redraw) * 1000 for _ in range(repeat)]
+        results[name] = {'mean_ms': float(np.median(times)), 'noise': {'mean_ms': spread(times)}}
+    game.renderer.set_scale(1.0)
+
+    speaker, line = 'Король:', game.king.text[0]
+    results['dialogue_panel'] = {
+        'cold_ms': best_of(repeat, lambda: TextRenderer(game_module.ASSET_DIRECTORY + 'pixel.ttf',
+                                                        game_module.ASSET_DIRECTORY + 'panel.png')
+                           .dialogue_panel(speaker, line)) * 1000,
+        'warm_ms': best_of(repeat, lambda: game.text_renderer.dialogue_panel(speaker, line)) * 1000,
+    }
+    game.scenes.close()
+    return results
+
+
+def flatten(results: dict, prefix: str = '') -> Dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        name = prefix + str(key)
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + '.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    current, previous = flatten(results['benchmarks']), flatten(baseline['benchmarks'])
+    regressions = []
+    for name, before in sorted(previous.items()):
+        after = current.get(name)
+        if after is None or not before or name.endswith(('.ticks', '.frames')) or '.noise.' in name:
+            continue
+        change = after / before - 1
+        worse = -change if name.endswith(HIGHER_IS_BETTER) else change
+        if name.endswith('_ms') and abs(after - before) < MIN_CHANGE_MS:
+            worse = 0
+        bucket, metric = name.rsplit('.', 1)
+        noise = '{}.noise.{}'.format(bucket, metric)
+        allowed = tolerance + max(previous.get(noise, 0), current.get(noise, 0))
+        marker = 'REGRESSION' if worse > allowed else ''
+        print('{:<55} {:>12.3f} {:>12.3f} {:>+8.1%} {}'.format(name, before, after, change, marker))
+        if marker:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="headless performance benchmarks for game_witcher")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="where to write the JSON results")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="results to compare against, if present")
+    parser.add_argument('--save-baseline', action='store_true', help="also store these results as the baseline")
+    parser.add_argument('--tolerance', type=float, default=0.15, help="allowed slowdown beyond the measured noise before a metric fails")
+    parser.add_argument('--ticks', type=int, default=3000, help="simulation ticks per quest run")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="repetitions per asset timing, the best is kept, and quest passes, the median is kept")
+    parser.add_argument('--only', choices=('assets', 'simulation', 'render'), action='append',
+                        help="run only these sections")
+    args = parser.parse_args(argv)
+
+    sections = args.only or ['assets', 'simulation', 'render']
+    pygame.init()
+    pygame.display.set_mode((1012, 576))
+
+    benchmarks, rss = {}, {}
+    if 'assets' in sections:
+        benchmarks['assets'] = bench_assets(args.repeat)
+        rss['assets'] = peak_rss_kb()
+    if 'simulation' in sections:
+        benchmarks['simulation'] = bench_simulation(args.ticks, args.repeat)
+        rss['simulation'] = peak_rss_kb()
+    if 'render' in sections:
+        benchmarks['render'] = bench_render(args.ticks, args.repeat)
+        rss['render'] = peak_rss_kb()
+    benchmarks['peak_rss_kb'] = rss
+
+    results = {'python': platform.python_version(), 'pygame': pygame.version.ver,
+               'machine': platform.machine(), 'cpus': os.cpu_count(), 'benchmarks': benchmarks}
+    with open(args.output, 'w') as file:
+        json.dump(results, file, indent=2)
+    print("results written to", os.path.normpath(args.output))
+
+    regressions = []
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as file:
+            json.dump(results, file, indent=2)
+        print("baseline written to", os.path.normpath(args.baseline))
+
+    pygame.quit()
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,102 @@
+from enum import Enum
+from typing import Mapping, Optional, Sequence, Tuple, Union
+
+
+# the simulation always advances in steps of TICK seconds, independent of the render rate
+SIMULATION_RATE = 56
+TICK = 1 / SIMULATION_RATE
+
+StateKey = Union[Enum, int]
+
+
+def _state_value(state: StateKey) -> int:
+    return state.value if isinstance(state, Enum) else state
+
+
+class AnimationSpec:
+    def __init__(self, frame_ticks: int, frame_count: int, freeze_on_end: bool = False,
+                 on_end: Optional[StateKey] = None, whitelist_reset: Optional[Sequence[StateKey]] = None):
+        self.frame_ticks = frame_ticks
+        self.frame_count = frame_count
+        self.freeze_on_end = freeze_on_end
+        self.on_end = on_end
+        self.whitelist_reset = whitelist_reset
+
+
+class AnimationTable:
+    __slots__ = ('states', 'frame_ticks', 'frame_count', 'freeze_on_end', 'end_state', 'reset_mask')
+
+    def __init__(self, states: Tuple, frame_ticks: Tuple[int, ...], frame_count: Tuple[int, ...],
+                 freeze_on_end: Tuple[bool, ...], end_state: Tuple[int, ...], reset_mask: Tuple[int, ...]):
+        self.states = states
+        self.frame_ticks = frame_ticks
+        self.frame_count = frame_count
+        self.freeze_on_end = freeze_on_end
+        self.end_state = end_state
+        self.reset_mask = reset_mask
+
+    @classmethod
+    def compile(cls, specs: Mapping[StateKey, AnimationSpec]) -> 'AnimationTable':
+        size = max(_state_value(state) for state in specs) + 1
+        states = [None] * size
+        frame_ticks = [1] * size
+        frame_count = [1] * size
+        freeze_on_end = [False] * size
+        end_state = [-1] * size
+        # bit t of reset_mask[s] is set when state s may be interrupted by state t
+        reset_mask = [(1 << size) - 1] * size
+
+        for state, spec in specs.items():
+            value = _state_value(state)
+            states[value] = state
+            frame_ticks[value] = spec.frame_ticks
+            frame_count[value] = spec.frame_count
+            freeze_on_end[value] = spec.freeze_on_end
+            if spec.on_end is not None:
+                end_state[value] = _state_value(spec.on_end)
+            if spec.whitelist_reset is not None:
+                reset_mask[value] = sum(1 << _state_value(target) for target in spec.whitelist_reset)
+
+        return cls(tuple(states), tuple(frame_ticks), tuple(frame_count), tuple(freeze_on_end), tuple(end_state),
+                   tuple(reset_mask))
+
+
+class AnimationState:
+    __slots__ = ('table', 'state', 'ticks')
+
+    def __init__(self, table: AnimationTable, state: StateKey = 0):
+        self.table = table
+        self.state = _state_value(state)
+        self.ticks = 0
+
+    @property
+    def animation_cnt(self) -> int:
+        table, state = self.table, self.state
+        cnt = self.ticks // table.frame_ticks[state]
+        if table.freeze_on_end[state]:
+            return min(cnt, table.frame_count[state] - 1)
+        return cnt % table.frame_count[state]
+
+    def access_reset(self, state: int) -> bool:
+        return bool(self.table.reset_mask[self.state] >> state & 1)
+
+    def set_state_force(self, state: int):
+        if self.state != state:
+            self.state = state
+            self.ticks = 0
+
+    def set_state(self, state: int) -> bool:
+        if self.table.reset_mask[self.state] >> state & 1:
+            if self.state != state:
+                self.state = state
+                self.ticks = 0
+            return True
+        return False
+
+    def tick(self, dt: float = TICK):
+        self.ticks += round(dt * SIMULATION_RATE)
+        table, state = self.table, self.state
+        end_state = table.end_state[state]
+        if end_state >= 0 and self.ticks >= table.frame_ticks[state] * table.frame_count[state]:
+            self.state = end_state
+            self.ticks = 0
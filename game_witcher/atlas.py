@@ -0,0 +1,103 @@
+import pygame
+import os
+import json
+import math
+import sys
+
+from typing import Tuple, Dict, Optional, Sequence, List
+
+
+ASSET_DIRECTORY = os.path.dirname(__file__) + "/../assets/"
+ATLAS_DIRECTORY = os.path.dirname(__file__) + "/../assets/atlas/"
+
+# frame sizes used by game.py for every character directory
+ATLAS_SPECS: Dict[str, Tuple[int, int]] = {
+    'character': (210, 210),
+    'enemy': (350, 280),
+    'king': (370, 370),
+    'keir': (128, 128),
+}
+
+
+class Atlas:
+    def __init__(self, index_path: str, image_path: str, size: Tuple[int, int],
+                 frames: Dict[str, Tuple[int, int, int, int]], sources: Dict[str, int]):
+        self.index_path = index_path
+        self.image_path = image_path
+        self.size = size
+        self.frames = frames
+        self.sources = sources
+
+    @classmethod
+    def open(cls, index_path: str) -> 'Atlas':
+        with open(index_path, encoding='utf-8') as file:
+            index = json.load(file)
+
+        return cls(index_path, os.path.join(os.path.dirname(index_path), index['image']), tuple(index['size']),
+                   {name: tuple(rect) for name, rect in index['frames'].items()}, index['sources'])
+
+    def covers(self, paths: Sequence[str], size: Tuple[int, int]) -> bool:
+        if tuple(size) != self.size:
+            return False
+
+        for path in paths:
+            name = os.path.basename(path)
+            if name not in self.frames:
+                return False
+            try:
+                if os.stat(path).st_mtime_ns != self.sources[name]:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    def subsurfaces(self, image: pygame.Surface, paths: Sequence[str]) -> List[pygame.Surface]:
+        return [image.subsurface(self.frames[os.path.basename(path)]) for path in paths]
+
+
+def atlas_index_path(source_directory: str, atlas_directory: str = ATLAS_DIRECTORY) -> str:
+    name = os.path.basename(os.path.normpath(source_directory))
+    return os.path.join(atlas_directory, name + '.json')
+
+
+def find_atlas(source_directory: str, atlas_directory: str = ATLAS_DIRECTORY) -> Optional[Atlas]:
+    index_path = atlas_index_path(source_directory, atlas_directory)
+    if not os.path.exists(index_path):
+        return None
+    return Atlas.open(index_path)
+
+
+def build_atlas(source_directory: str, size: Tuple[int, int], atlas_directory: str = ATLAS_DIRECTORY) -> Atlas:
+    names = sorted(name for name in os.listdir(source_directory) if name.endswith('.png'))
+    columns = max(1, math.ceil(math.sqrt(len(names))))
+    rows = max(1, math.ceil(len(names) / columns))
+    width, height = size
+
+    image = pygame.Surface((columns * width, rows * height), pygame.SRCALPHA)
+    frames = {}
+    sources = {}
+    for i, name in enumerate(names):
+        path = os.path.join(source_directory, name)
+        rect = ((i % columns) * width, (i // columns) * height, width, height)
+        image.blit(pygame.transform.scale(pygame.image.load(path), size), rect[:2])
+        frames[name] = rect
+        sources[name] = os.stat(path).st_mtime_ns
+
+    os.makedirs(atlas_directory, exist_ok=True)
+    index_path = atlas_index_path(source_directory, atlas_directory)
+    image_name = os.path.basename(index_path)[:-len('.json')] + '.png'
+    pygame.image.save(image, os.path.join(atlas_directory, image_name))
+    with open(index_path, 'w', encoding='utf-8') as file:
+        json.dump({'image': image_name, 'size': list(size), 'frames': frames, 'sources': sources}, file, indent=1)
+
+    return Atlas(index_path, os.path.join(atlas_directory, image_name), tuple(size), frames, sources)
+
+
+def build_all(asset_directory: str = ASSET_DIRECTORY, atlas_directory: str = ATLAS_DIRECTORY):
+    for name, size in ATLAS_SPECS.items():
+        atlas = build_atlas(os.path.join(asset_directory, name), size, atlas_directory)
+        print("atlas", name, len(atlas.frames), "frames ->", atlas.image_path)
+
+
+if __name__ == '__main__':
+    build_all(*sys.argv[1:])
@@ -0,0 +1,103 @@
+import pygame
+
+from time import perf_counter
+from typing import Dict, List, Optional
+from game_witcher.telemetry import get_logger
+
+
+CHANNELS = 8
+FADE_MS = 800
+
+log = get_logger('game')
+
+
+class AudioManager:
+    # effects are decoded once into Sounds and played on a fixed pool of channels,
+    # when every channel is busy the lowest priority, oldest voice is stolen
+    def __init__(self, channels: int = CHANNELS, enabled: bool = True):
+        self.enabled = enabled and self._init_mixer()
+        self.sounds: Dict[str, pygame.mixer.Sound] = {}
+        self.music: Optional[str] = None
+        self.dropped = 0
+        self._pending_music: Optional[str] = None
+        self._fade_ms = FADE_MS
+        self._channels: List[pygame.mixer.Channel] = []
+        self._priority: List[int] = []
+        self._started: List[float] = []
+
+        if self.enabled:
+            pygame.mixer.set_num_channels(channels)
+            self._channels = [pygame.mixer.Channel(i) for i in range(channels)]
+            self._priority = [0] * channels
+            self._started = [0.0] * channels
+
+    @staticmethod
+    def _init_mixer() -> bool:
+        try:
+            if pygame.mixer.get_init() is None:
+                pygame.mixer.init()
+        except pygame.error as e:
+            log.warning("sound disabled: %s", e)
+            return False
+        return True
+
+    def load(self, name: str, path: str, volume: float = 1.0):
+        if not self.enabled:
+            return
+        try:
+            sound = pygame.mixer.Sound(path)
+        except (pygame.error, FileNotFoundError) as e:
+            log.warning("could not load sound %s: %s", path, e)
+            return
+        sound.set_volume(volume)
+        self.sounds[name] = sound
+
+    def _pick_channel(self, priority: int) -> int:
+        victim = -1
+        for i, channel in enumerate(self._channels):
+            if not channel.get_busy():
+                return i
+            if victim < 0 or (self._priority[i], self._started[i]) < (self._priority[victim], self._started[victim]):
+                victim = i
+        return victim if self._priority[victim] <= priority else -1
+
+    def play(self, name: str, priority: int = 0) -> Optional[pygame.mixer.Channel]:
+        sound = self.sounds.get(name)
+        if sound is None:
+            return None
+
+        i = self._pick_channel(priority)
+        if i < 0:
+            self.dropped += 1
+            return None
+        channel = self._channels[i]
+        channel.play(sound)
+        self._priority[i] = priority
+        self._started[i] = perf_counter()
+        return channel
+
+    def play_music(self, path: Optional[str], fade_ms: int = FADE_MS):
+        # the mixer streams a single music track, so the old one fades out before the new one fades in
+        if not self.enabled or path == self.music:
+            return
+        self.music = path
+        self._fade_ms = fade_ms
+        if pygame.mixer.music.get_busy():
+            pygame.mixer.music.fadeout(fade_ms)
+        self._pending_music = path
+        self.update()
+
+    def update(self):
+        if self._pending_music is None or pygame.mixer.music.get_busy():
+            return
+        path, self._pending_music = self._pending_music, None
+        try:
+            pygame.mixer.music.load(path)
+            pygame.mixer.music.play(fade_ms=self._fade_ms)
+        except pygame.error as e:
+            log.warning("could not play music %s: %s", path, e)
+
+    def stop(self):
+        if self.enabled:
+            pygame.mixer.stop()
+            pygame.mixer.music.stop()
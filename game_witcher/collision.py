@@ -0,0 +1,140 @@
+import pygame
+
+from typing import Dict, Set, List, Tuple, Hashable, Callable, Optional
+
+
+Cell = Tuple[int, int]
+Listener = Callable[[Hashable, Hashable], None]
+
+
+class CollisionWorld:
+    def __init__(self, cell_size: int = 256):
+        self.cell_size = cell_size
+        self._version = 0
+        self._overlaps: Dict[Hashable, Tuple[int, Set[Hashable]]] = {}
+        self._rects: Dict[Hashable, pygame.Rect] = {}
+        self._cells: Dict[Cell, Set[Hashable]] = {}
+        self._cells_of: Dict[Hashable, Tuple[int, int, int, int]] = {}
+        self._triggers: Set[Hashable] = set()
+        self._contacts: Dict[Hashable, Set[Hashable]] = {}
+        self._on_enter: Dict[Hashable, List[Listener]] = {}
+        self._on_exit: Dict[Hashable, List[Listener]] = {}
+
+    def __contains__(self, key: Hashable):
+        return key in self._rects
+
+    def _cell_range(self, rect: pygame.Rect) -> Tuple[int, int, int, int]:
+        size = self.cell_size
+        return (rect.left // size, rect.top // size,
+                (rect.right - 1) // size if rect.width else rect.left // size,
+                (rect.bottom - 1) // size if rect.height else rect.top // size)
+
+    @staticmethod
+    def _iter_cells(cells: Tuple[int, int, int, int]):
+        left, top, right, bottom = cells
+        for x in range(left, right + 1):
+            for y in range(top, bottom + 1):
+                yield x, y
+
+    def add(self, key: Hashable, rect: pygame.Rect, trigger: bool = False):
+        if key in self._rects:
+            self.remove(key)
+
+        self._version += 1
+        self._rects[key] = pygame.Rect(rect)
+        cells = self._cells_of[key] = self._cell_range(self._rects[key])
+        for cell in self._iter_cells(cells):
+            self._cells.setdefault(cell, set()).add(key)
+        if trigger:
+            self._triggers.add(key)
+
+    def remove(self, key: Hashable):
+        self._version += 1
+        for cell in self._iter_cells(self._cells_of.pop(key)):
+            bucket = self._cells[cell]
+            bucket.discard(key)
+            if not bucket:
+                del self._cells[cell]
+        del self._rects[key]
+        self._triggers.discard(key)
+        self._contacts.pop(key, None)
+        self._overlaps.pop(key, None)
+
+    def move(self, key: Hashable, rect: pygame.Rect):
+        if key not in self._rects:
+            self.add(key, rect)
+            return
+
+        current = self._rects[key]
+        if current == rect:
+            return
+        current.update(rect)
+        self._version += 1
+
+        cells = self._cell_range(current)
+        previous = self._cells_of[key]
+        if cells == previous:
+            return
+
+        for cell in self._iter_cells(previous):
+            bucket = self._cells[cell]
+            bucket.discard(key)
+            if not bucket:
+                del self._cells[cell]
+        for cell in self._iter_cells(cells):
+            self._cells.setdefault(cell, set()).add(key)
+        self._cells_of[key] = cells
+
+    def rect(self, key: Hashable) -> pygame.Rect:
+        return self._rects[key]
+
+    def is_trigger(self, key: Hashable) -> bool:
+        return key in self._triggers
+
+    def query(self, rect: pygame.Rect, exclude: Optional[Hashable] = None) -> Set[Hashable]:
+        rect = pygame.Rect(rect)
+        cells = self._cells
+        left, top, right, bottom = self._cell_range(rect)
+        candidates = set()
+        for x in range(left, right + 1):
+            for y in range(top, bottom + 1):
+                bucket = cells.get((x, y))
+                if bucket:
+                    candidates |= bucket
+        candidates.discard(exclude)
+        rects = self._rects
+        return {key for key in candidates if rect.colliderect(rects[key])}
+
+    def overlaps(self, key: Hashable) -> Set[Hashable]:
+        # answers are reused until anything in the world is added, removed or moved
+        cached = self._overlaps.get(key)
+        if cached is not None and cached[0] == self._version:
+            return cached[1]
+
+        found = self.query(self._rects[key], exclude=key)
+        self._overlaps[key] = (self._version, found)
+        return found
+
+    def listen(self, key: Hashable, on_enter: Optional[Listener] = None, on_exit: Optional[Listener] = None):
+        if on_enter is not None:
+            self._on_enter.setdefault(key, []).append(on_enter)
+        if on_exit is not None:
+            self._on_exit.setdefault(key, []).append(on_exit)
+
+    def update_contacts(self, key: Hashable) -> Tuple[Set[Hashable], Set[Hashable]]:
+        current = self.overlaps(key)
+        previous = self._contacts.get(key, set())
+        self._contacts[key] = current
+
+        entered = current - previous
+        exited = previous - current
+        for other in entered:
+            for listener in self._on_enter.get(other, ()):
+                listener(other, key)
+        for other in exited:
+            for listener in self._on_exit.get(other, ()):
+                listener(other, key)
+        return entered, exited
+
+    def contacts(self, key: Hashable) -> Set[Hashable]:
+        return self._contacts.get(key, set())
@@ -0,0 +1,89 @@
+import pygame
+import os
+import mmap
+import struct
+import hashlib
+
+from typing import Tuple, Optional, Callable
+
+
+CACHE_DIRECTORY = os.environ.get('GAME_WITCHER_CACHE', os.path.dirname(__file__) + "/../.sprite_cache/")
+
+# magic, format version, source mtime_ns, width, height, has alpha
+HEADER = struct.Struct('<4sIqIIB')
+MAGIC = b'GWSC'
+VERSION = 1
+
+
+def pixel_format(has_alpha: bool) -> str:
+    return 'RGBA' if has_alpha else 'RGBX'
+
+
+class SpriteDiskCache:
+    def __init__(self, directory: str = CACHE_DIRECTORY):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+
+    def entry_path(self, path: str, size: Optional[Tuple[int, int]]) -> str:
+        source = os.path.normpath(os.path.abspath(path))
+        key = '{}|{}'.format(source, 'native' if size is None else '{}x{}'.format(*size))
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.raw')
+
+    def get(self, path: str, size: Optional[Tuple[int, int]],
+            convert: Callable[[pygame.Surface], pygame.Surface]) -> Optional[pygame.Surface]:
+        try:
+            mtime = os.stat(path).st_mtime_ns
+            file = open(self.entry_path(path, size), 'rb')
+        except OSError:
+            self.misses += 1
+            return None
+
+        with file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if len(data) < HEADER.size:
+                self.misses += 1
+                return None
+            magic, version, source_mtime, width, height, has_alpha = HEADER.unpack_from(data)
+            if (magic != MAGIC or version != VERSION or source_mtime != mtime
+                    or (size is not None and (width, height) != tuple(size))
+                    or len(data) != HEADER.size + width * height * 4):
+                self.misses += 1
+                return None
+
+            pixels = memoryview(data)[HEADER.size:]
+            raw = pygame.image.frombuffer(pixels, (width, height), pixel_format(has_alpha))
+            # the surface must own its pixels before the mapping is closed
+            surface = convert(raw)
+            if surface is raw:
+                surface = raw.copy()
+            del raw
+            pixels.release()
+
+        self.hits += 1
+        return surface
+
+    def put(self, path: str, surface: pygame.Surface, size: Optional[Tuple[int, int]] = None):
+        has_alpha = bool(surface.get_flags() & pygame.SRCALPHA)
+        self.put_bytes(path, size, surface.get_size(), has_alpha,
+                       pygame.image.tobytes(surface, pixel_format(has_alpha)))
+
+    def put_bytes(self, path: str, size: Optional[Tuple[int, int]], dimensions: Tuple[int, int], has_alpha: bool,
+                  pixels: bytes):
+        try:
+            mtime = os.stat(path).st_mtime_ns
+            os.makedirs(self.directory, exist_ok=True)
+            entry = self.entry_path(path, size)
+            temporary = '{}.{}.tmp'.format(entry, os.getpid())
+            with open(temporary, 'wb') as file:
+                file.write(HEADER.pack(MAGIC, VERSION, mtime, dimensions[0], dimensions[1], has_alpha))
+                file.write(pixels)
+            os.replace(temporary, entry)
+        except OSError:
+            pass
+
+    def clear(self):
+        if not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            if name.endswith('.raw'):
+                os.remove(os.path.join(self.directory, name))
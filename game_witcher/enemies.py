@@ -0,0 +1,213 @@
+import numpy as np
+import pygame
+
+from typing import Optional, Sequence, Tuple
+from game_witcher.animation import AnimationTable
+from game_witcher.frames import frame_offset
+from game_witcher.rotation import rotation_cache
+
+
+IDLE, DEAD, WALK, ATTACK = 0, 1, 2, 3
+LEFT, RIGHT = 0, 1
+OFFSCREEN = -1000
+
+
+class EnemyType:
+    # animation frames and the compiled state table shared by every enemy of one kind, indexed by state value
+    def __init__(self, animations: Sequence, table: AnimationTable, size: Tuple[int, int],
+                 vel: int = 2, hp: int = 100, attack_range: int = 30, shake_angle: float = 15.0, shake_steps: int = 7):
+        self.animations = list(animations)
+        self.table = table
+        self.size = size
+        self.vel = vel
+        self.hp = hp
+        self.attack_range = attack_range
+        # a hit tilts the sprite by shake_angle degrees, easing back upright over about shake_steps ticks
+        self.shake_angle = shake_angle
+        self.shake_decay = 0.1 + shake_angle / shake_steps
+        self.frame_ticks = np.array(table.frame_ticks, dtype=np.int32)
+        self.frame_count = np.array(table.frame_count, dtype=np.int32)
+        self.freeze_on_end = np.array(table.freeze_on_end, dtype=bool)
+        self.end_state = np.array(table.end_state, dtype=np.int8)
+        # reset_allowed[current, target]: may an entity in `current` switch to `target` right now
+        states = np.arange(len(table.reset_mask))
+        masks = np.array(table.reset_mask, dtype=np.int64)
+        self.reset_allowed = (masks[:, None] >> states[None, :]) & 1 == 1
+
+
+class EnemyStore:
+    def __init__(self, enemy_type: EnemyType, screen=None, capacity: int = 16):
+        self.type = enemy_type
+        self.win = screen
+        self.count = 0
+        self.visible = False
+        self._allocate(capacity)
+
+    def _allocate(self, capacity: int):
+        def grow(name, dtype):
+            array = np.zeros(capacity, dtype=dtype)
+            if hasattr(self, name):
+                array[:self.count] = getattr(self, name)[:self.count]
+            setattr(self, name, array)
+
+        for name in ('x', 'y', 'prev_x', 'prev_y', 'rect_x', 'rect_y', 'vel', 'hp', 'ticks'):
+            grow(name, np.int32)
+        for name in ('direction', 'state'):
+            grow(name, np.int8)
+        grow('angle', np.float32)
+        grow('dead', bool)
+
+    def __len__(self):
+        return self.count
+
+    def spawn(self, x: int, y: int, direction: int = RIGHT) -> int:
+        if self.count == len(self.x):
+            self._allocate(len(self.x) * 2)
+
+        i = self.count
+        self.count += 1
+        self.x[i] = self.prev_x[i] = self.rect_x[i] = x
+        self.y[i] = self.prev_y[i] = self.rect_y[i] = y
+        self.vel[i] = self.type.vel
+        self.hp[i] = self.type.hp
+        self.direction[i] = direction
+        self.state[i] = IDLE
+        self.ticks[i] = 0
+        self.angle[i] = 0
+        self.dead[i] = False
+        return i
+
+    def view(self, name: str) -> np.ndarray:
+        return getattr(self, name)[:self.count]
+
+    def set_state(self, mask: np.ndarray, state: int) -> np.ndarray:
+        if not mask.any():
+            return mask
+        n = self.count
+        current = self.state[:n]
+        allowed = mask & self.type.reset_allowed[current, state]
+        changed = allowed & (current != state)
+        current[changed] = state
+        self.ticks[:n][changed] = 0
+        return allowed
+
+    def animation_cnt(self) -> np.ndarray:
+        n = self.count
+        state = self.state[:n]
+        cnt = self.ticks[:n] // self.type.frame_ticks[state]
+        count = self.type.frame_count[state]
+        return np.where(self.type.freeze_on_end[state], np.minimum(cnt, count - 1), cnt % count)
+
+    def think(self, char_x: int, char_rect: pygame.Rect, char_alive: bool) -> bool:
+        # one vectorized pass of the chase/attack logic, returns whether any enemy is striking the character
+        n = self.count
+        if n == 0:
+            return False
+
+        x, state, direction = self.x[:n], self.state[:n], self.direction[:n]
+        dead = self.dead[:n]
+        self.set_state(dead, DEAD)
+        if not self.visible:
+            return False
+
+        alive = ~dead
+        in_range = alive & (np.abs(char_x - x) <= self.type.attack_range) & (direction == LEFT)
+        striking = in_range if char_alive else np.zeros(n, dtype=bool)
+        self.set_state(striking, ATTACK)
+        if not char_alive:
+            self.set_state(in_range, IDLE)
+
+        width, height = self.type.size
+        rect_x, rect_y = self.rect_x[:n], self.rect_y[:n]
+        touching = ((rect_x < char_rect.right) & (rect_x + width > char_rect.left)
+                    & (rect_y < char_rect.bottom) & (rect_y + height > char_rect.top))
+        chasing = alive & ~in_range & touching & (state != DEAD)
+
+        left_of, right_of = chasing & (char_x < x), chasing & (char_x > x)
+        walk_left = self.set_state(left_of, WALK)
+        walk_right = self.set_state(right_of, WALK)
+        direction[walk_left] = LEFT
+        direction[walk_right] = RIGHT
+        vel = self.vel[:n]
+        x[walk_left] -= vel[walk_left]
+        x[walk_right] += vel[walk_right]
+
+        self.set_state(alive & ~in_range & ~chasing, IDLE)
+        return bool(striking.any())
+
+    def frame_mask(self, i: int) -> pygame.mask.Mask:
+        state = self.state[i]
+        animation = self.type.animations[state]
+        cnt = self.ticks[i] // self.type.frame_ticks[state]
+        count = self.type.frame_count[state]
+        cnt = min(cnt, count - 1) if self.type.freeze_on_end[state] else cnt % count
+        return animation.masks(self.direction[i] == LEFT)[cnt]
+
+    def hit(self, rect: pygame.Rect, damage: int, mask: Optional[pygame.mask.Mask] = None) -> np.ndarray:
+        n = self.count
+        rect_x, rect_y = self.rect_x[:n], self.rect_y[:n]
+        width, height = self.type.size
+        hit = ((rect_x < rect.right) & (rect_x + width > rect.left)
+               & (rect_y < rect.bottom) & (rect_y + height > rect.top))
+        if mask is not None:
+            # bounding boxes only nominate candidates, the pixels of the current frames decide
+            for i in np.flatnonzero(hit).tolist():
+                offset = (int(rect_x[i]) - rect.x, int(rect_y[i]) - rect.y)
+                if mask.overlap(self.frame_mask(i), offset) is None:
+                    hit[i] = False
+        self.hp[:n][hit] -= damage
+        self.angle[:n][hit] = self.type.shake_angle
+        killed = hit & (self.hp[:n] <= 0)
+        self.set_state(killed, DEAD)
+        self.dead[:n][killed] = True
+        return hit
+
+    def remember_position(self):
+        n = self.count
+        self.prev_x[:n] = self.x[:n]
+        self.prev_y[:n] = self.y[:n]
+
+    def update(self):
+        n = self.count
+        if not self.visible:
+            self.rect_x[:n] = OFFSCREEN
+            self.rect_y[:n] = OFFSCREEN
+            return
+
+        angle = self.angle[:n]
+        np.maximum(angle - self.type.shake_decay, 0, out=angle)
+
+        state, ticks = self.state[:n], self.ticks[:n]
+        ticks += 1
+        cnt = ticks // self.type.frame_ticks[state]
+        end_state = self.type.end_state[state]
+        ended = (end_state >= 0) & (cnt >= self.type.frame_count[state])
+        state[ended] = end_state[ended]
+        ticks[ended] = 0
+
+        self.rect_x[:n] = self.x[:n]
+        self.rect_y[:n] = self.y[:n]
+
+    def redraw_screen(self, alpha=1.0):
+        if not self.visible:
+            return
+
+        n = self.count
+        # teleports are not interpolated, matching the single-actor rule in game.py
+        prev_x, x = self.prev_x[:n], self.x[:n]
+        prev_y, y = self.prev_y[:n], self.y[:n]
+        draw_x = np.where(np.abs(x - prev_x) > 100, x, np.rint(prev_x + (x - prev_x) * alpha)).astype(int)
+        draw_y = np.where(np.abs(y - prev_y) > 100, y, np.rint(prev_y + (y - prev_y) * alpha)).astype(int)
+
+        animations = self.type.animations
+        rotated = rotation_cache.rotated
+        for state, direction, frame, px, py, angle in zip(self.state[:n].tolist(), self.direction[:n].tolist(),
+                                                          self.animation_cnt().tolist(), draw_x.tolist(),
+                                                          draw_y.tolist(), self.angle[:n].tolist()):
+            animation = animations[state]
+            image = (animation.left if direction == LEFT else animation.right)[frame]
+            ox, oy = frame_offset(image)
+            if angle:
+                image, (dx, dy) = rotated(image, angle)
+                ox, oy = ox + dx, oy + dy
+            self.win.blit(image, (px + ox, py + oy))
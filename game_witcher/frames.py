@@ -0,0 +1,80 @@
+import pygame
+
+from typing import Tuple
+from weakref import WeakKeyDictionary
+
+
+Offset = Tuple[int, int]
+Size = Tuple[int, int]
+
+# frames trimmed to their opaque bounding box, with where that box sat in the full frame and the full size
+_trims: 'WeakKeyDictionary[pygame.Surface, Tuple[Offset, Size]]' = WeakKeyDictionary()
+
+
+def trim(surface: pygame.Surface) -> pygame.Surface:
+    rect = surface.get_bounding_rect()
+    size = surface.get_size()
+    if rect.size == size:
+        return surface
+    # a fully transparent frame still keeps one pixel so it stays a valid surface
+    rect.width, rect.height = max(rect.width, 1), max(rect.height, 1)
+    trimmed = surface.subsurface(rect).copy()
+    _trims[trimmed] = (rect.topleft, size)
+    return trimmed
+
+
+def is_trimmed(surface: pygame.Surface) -> bool:
+    return surface in _trims
+
+
+def frame_offset(surface: pygame.Surface) -> Offset:
+    if not _trims:
+        return 0, 0
+    found = _trims.get(surface)
+    return (0, 0) if found is None else found[0]
+
+
+def frame_size(surface: pygame.Surface) -> Size:
+    if not _trims:
+        return surface.get_size()
+    found = _trims.get(surface)
+    return surface.get_size() if found is None else found[1]
+
+
+def carry_trim(source: pygame.Surface, target: pygame.Surface) -> pygame.Surface:
+    # for copies made by convert() and friends, which keep the pixels but not the offset
+    found = _trims.get(source)
+    if found is not None:
+        _trims[target] = found
+    return target
+
+
+def flip_frame(surface: pygame.Surface) -> pygame.Surface:
+    flipped = pygame.transform.flip(surface, True, False)
+    found = _trims.get(surface)
+    if found is not None:
+        (x, y), size = found
+        _trims[flipped] = ((size[0] - x - surface.get_width(), y), size)
+    return flipped
+
+
+def expand(surface: pygame.Surface) -> pygame.Surface:
+    # a full-size copy, for code that composites onto the frame rather than just blitting it
+    found = _trims.get(surface)
+    if found is None:
+        return surface.copy()
+    offset, size = found
+    full = pygame.Surface(size, pygame.SRCALPHA)
+    full.blit(surface, offset)
+    return full
+
+
+def frame_mask(surface: pygame.Surface) -> pygame.mask.Mask:
+    # always full frame size, so collision offsets do not depend on the storage mode
+    found = _trims.get(surface)
+    if found is None:
+        return pygame.mask.from_surface(surface)
+    offset, size = found
+    mask = pygame.mask.Mask(size)
+    mask.draw(pygame.mask.from_surface(surface), offset)
+    return mask
@@ -1,16 +1,33 @@
 import pygame
+import numpy as np
 import os
 import logging
+import argparse
+import glob
 
 from datetime import datetime
-from game_witcher.utils import pygame_load_image
+from time import perf_counter
+from game_witcher.animation import AnimationSpec, AnimationState, AnimationTable, SIMULATION_RATE, TICK
+from game_witcher.atlas import ATLAS_SPECS
+from game_witcher.audio import AudioManager
+from game_witcher.disk_cache import SpriteDiskCache
+from game_witcher.collision import CollisionWorld
+from game_witcher.enemies import EnemyStore, EnemyType
+from game_witcher.frames import flip_frame, frame_mask, frame_offset, frame_size
+from game_witcher.hot_reload import AssetWatcher
+from game_witcher.input_log import InputRecorder
+from game_witcher.profiler import FrameProfiler, OVERLAY_POSITION
+from game_witcher.render import ResolutionGovernor, ScaledRenderer, LAYER_DIALOGUE, LAYER_OVERLAY, LAYER_PLAYER, LAYER_TEXT
+from game_witcher.rotation import rotation_cache
+from game_witcher.scene import Scene, SceneManager, decode_background
+from game_witcher.telemetry import get_logger, parse_levels, setup_logging
+from game_witcher.text import TextRenderer, PANEL_POSITION
+from game_witcher.utils import asset_cache, pygame_load_image, pygame_load_mirror, sequence_paths, shutdown_workers, \
+    LazyFrames
 from enum import Enum
-from typing import List, Dict
-from copy import deepcopy
+from typing import List, Dict, Optional, Sequence, Iterable
 
 
-pygame.init()
-
 ASSET_DIRECTORY = os.path.dirname(__file__) + "/../assets/"
 ASSET_DIRECTORY_CHARACTER = os.path.dirname(__file__) + "/../assets/character/"
 ASSET_DIRECTORY_ENEMY = os.path.dirname(__file__) + "/../assets/enemy/"
@@ -18,6 +35,25 @@ ASSET_DIRECTORY_KEIR = os.path.dirname(__file__) + "/../assets/keir/"
 ASSET_DIRECTORY_KING = os.path.dirname(__file__) + "/../assets/king/"
 print("ASSET_DIRECTORY", ASSET_DIRECTORY)
 
+log = get_logger('game')
+input_log = get_logger('input')
+events_log = get_logger('events')
+combat_log = get_logger('combat')
+world_log = get_logger('world')
+dialogue_log = get_logger('dialogue')
+
+MAX_FRAME_TIME = 0.25
+# the part of each frame rendering may take before --render-scale auto drops the resolution
+RENDER_SHARE = 0.5
+# teleports (scene changes, tavern) are not interpolated
+MAX_INTERPOLATED_DISTANCE = 100
+
+
+def interpolate(previous, current, alpha):
+    if abs(current - previous) > MAX_INTERPOLATED_DISTANCE:
+        return current
+    return round(previous + (current - previous) * alpha)
+
 
 class CharacterState(Enum):
     idle = 0
@@ -46,55 +82,40 @@ class EnemyState(Enum):
 
 
 class MirrorAnimation:
-    left: List[pygame.Surface]
+    left: Sequence[pygame.Surface]
     right: List[pygame.Surface]
 
-    def __init__(self, animation: List[pygame.Surface]):
+    def __init__(self, animation: List[pygame.Surface], mirrored: Optional[Sequence[pygame.Surface]] = None,
+                 with_masks=False):
         self.right = animation
-        self.left = list(map(lambda i: pygame.transform.flip(i, True, False), animation))
-
-
-class CounterAnimation:
-    def __init__(self, max_frame_cnt, max_animation_cnt, animation_end_function=None, whitelist_reset=None, freeze_on_end=False):
-        self._whitelist_reset = whitelist_reset
-        self._max_frame_cnt = max_frame_cnt
-        self._max_animation_cnt = max_animation_cnt
-        self._frame_cnt = 0
-        self._animation_cnt = 0
-        self._animation_end_function = animation_end_function
-        self.freeze_on_end = freeze_on_end
-
-    def access_reset(self, state):
-        return self._whitelist_reset is None or state in self._whitelist_reset
-
-    @property
-    def animation_cnt(self):
-        return self._animation_cnt
-
-    @property
-    def frame_cnt(self):
-        return self._frame_cnt
-
-    def duplicate(self):
-        new = deepcopy(self)
-        new._frame_cnt = 0
-        new._animation_cnt = 0
-
-        return new
-
-    def tick(self):
-        self._frame_cnt += 1
-        if self._frame_cnt >= self._max_frame_cnt:
-            self._frame_cnt = 0
-
-            if not self.freeze_on_end or self._animation_cnt != self._max_animation_cnt -1 :
-                self._animation_cnt += 1
-
-            if self._animation_cnt >= self._max_animation_cnt:
-                if self._animation_end_function is None:
-                    self._animation_cnt = 0
-                else:
-                    self._animation_end_function()
+        if mirrored is None:
+            mirrored = LazyFrames(len(animation), lambda i: flip_frame(animation[i]))
+        self.left = mirrored
+        self.right_masks: Optional[List[pygame.mask.Mask]] = None
+        self.left_masks: Optional[LazyFrames] = None
+        if with_masks:
+            # mirrored masks come from the mirrored frames, so each frame is flipped once and only when used
+            self.right_masks = [frame_mask(frame) for frame in animation]
+            self.left_masks = LazyFrames(len(animation), lambda i: frame_mask(self.left[i]))
+
+    def masks(self, left):
+        return self.left_masks if left else self.right_masks
+
+    def prewarm(self):
+        if isinstance(self.left, LazyFrames):
+            self.left.prewarm()
+
+    def replace(self, replaced: Dict[pygame.Surface, pygame.Surface]) -> bool:
+        # swaps in reloaded frames, old frame -> new one, and rebuilds what was derived from them
+        changed = [i for i, frame in enumerate(self.right) if frame in replaced]
+        for i in changed:
+            frame = self.right[i] = replaced[self.right[i]]
+            if isinstance(self.left, LazyFrames):
+                self.left.invalidate(i)
+            if self.right_masks is not None:
+                self.right_masks[i] = frame_mask(frame)
+                self.left_masks.invalidate(i)
+        return bool(changed)
 
 
 class RotateAnimation:
@@ -110,8 +131,8 @@ class RotateAnimation:
     def rotate(self):
         self.cur_eagle = self._eagle
 
-    def tick(self):
-        self.cur_eagle -= 0.1 + self._eagle / self.steps
+    def tick(self, dt=TICK):
+        self.cur_eagle -= (0.1 + self._eagle / self.steps) * dt * SIMULATION_RATE
         if self.cur_eagle <= 0:
             self.cur_eagle = 0
 
@@ -123,14 +144,54 @@ class StrictRotate:
     def rotate(self):
         pass
 
-    def tick(self):
+    def tick(self, dt=TICK):
         pass
 
 
+# frame length in ticks and frame count per state, compiled once and shared by every instance
+CHARACTER_ANIMATIONS = AnimationTable.compile({
+    CharacterState.idle: AnimationSpec(4, 15),
+    CharacterState.walk: AnimationSpec(5, 8),
+    CharacterState.attack: AnimationSpec(5, 7, on_end=CharacterState.idle, whitelist_reset=(CharacterState.attack2,)),
+    CharacterState.attack2: AnimationSpec(5, 7, on_end=CharacterState.idle, whitelist_reset=(CharacterState.attack3,)),
+    CharacterState.attack3: AnimationSpec(5, 7, on_end=CharacterState.idle, whitelist_reset=()),
+    CharacterState.dead: AnimationSpec(5, 14, freeze_on_end=True),
+})
+
+# first frame, frame count, file pattern and digits in the number for every character state
+CHARACTER_FRAMES = {
+    CharacterState.attack: (0, 7, "attack_{}.png", 2),
+    CharacterState.attack2: (8, 7, "attack_{}.png", 2),
+    CharacterState.attack3: (14, 7, "attack_{}.png", None),
+    CharacterState.idle: (0, 15, "idle_{}.png", None),
+    CharacterState.walk: (0, 8, "run_{}.png", None),
+    CharacterState.dead: (0, 14, "death_{}.png", None),
+}
+# states whose mirrored frames are built at load, the rest are flipped when first shown
+CHARACTER_PREWARMED = (CharacterState.walk, CharacterState.attack, CharacterState.attack2, CharacterState.attack3)
+
+# frames of each swing where the blade is out, hits are resolved on those with that frame's mask
+STRIKE_FRAMES = {
+    CharacterState.attack: (5, 6),
+    CharacterState.attack2: (2, 3, 4),
+    CharacterState.attack3: (3, 4),
+}
+
+ENEMY_ANIMATIONS = AnimationTable.compile({
+    EnemyState.idle: AnimationSpec(9, 6),
+    EnemyState.dead: AnimationSpec(6, 7, freeze_on_end=True),
+    EnemyState.walk: AnimationSpec(12, 6),
+    EnemyState.attack: AnimationSpec(5, 6, on_end=EnemyState.idle, whitelist_reset=(EnemyState.attack,)),
+})
+
+KEIR_ANIMATIONS = AnimationTable.compile({0: AnimationSpec(10, 5)})
+KING_ANIMATIONS = AnimationTable.compile({0: AnimationSpec(5, 17)})
+
+
 class Keir:
     def __init__(self, x, y, screen, weight, height, asset_directory):
-        self.keir_sprite = pygame.transform.scale(pygame.image.load(asset_directory + 'barkeep_00.png'), (weight, height))
-        self.rect = self.keir_sprite.get_rect(topleft=(-1000, -1000))
+        self.keir_sprite = asset_cache.load(asset_directory + 'barkeep_00.png', (weight, height))
+        self.rect = pygame.Rect((-1000, -1000), frame_size(self.keir_sprite))
         self.win = screen
         self.x = x
         self.y = y
@@ -146,25 +207,26 @@ class Keir:
         self.animation_by_state = MirrorAnimation(pygame_load_image
                                                   (0, 5, os.path.join(asset_directory, "barkeep_{}.png"),
                                                    (weight, height), max_number_len=2)),
-        self.counter_animation_by_state = CounterAnimation(10, 5)
-
-        self.counter_animation = self.counter_animation_by_state.duplicate()
+        self.animation = AnimationState(KEIR_ANIMATIONS)
 
-    def redraw_screen(self):
+    def update(self, dt=TICK):
         if self.default == self.bg:
-            self.rect = self.keir_sprite.get_rect(topleft=(self.x, self.y))
-            anim = self.animation_by_state[0].right[self.counter_animation.animation_cnt]
-            self.win.blit(anim, (self.x, self.y))
-
-            self.counter_animation.tick()
+            self.rect = pygame.Rect((self.x, self.y), frame_size(self.keir_sprite))
+            self.animation.tick(dt)
         else:
-            self.rect = self.keir_sprite.get_rect(topleft=(-1000, -1000))
+            self.rect = pygame.Rect((-1000, -1000), frame_size(self.keir_sprite))
+
+    def redraw_screen(self, alpha=1.0):
+        if self.default == self.bg:
+            anim = self.animation_by_state[0].right[self.animation.animation_cnt]
+            ox, oy = frame_offset(anim)
+            self.win.blit(anim, (self.x + ox, self.y + oy))
 
 
 class King:
     def __init__(self, x, y, screen, weight, height, asset_directory):
-        self.king_sprite = pygame.transform.scale(pygame.image.load(asset_directory + 'king_00.png'), (weight, height))
-        self.rect = self.king_sprite.get_rect(topleft=(x, y))
+        self.king_sprite = asset_cache.load(asset_directory + 'king_00.png', (weight, height))
+        self.rect = pygame.Rect((x, y), frame_size(self.king_sprite))
         self.win = screen
         self.x = x
         self.y = y
@@ -180,16 +242,17 @@ class King:
         self.animation_by_state = MirrorAnimation(pygame_load_image
                                                   (0, 17, os.path.join(asset_directory, "king_{}.png"),
                                                    (weight, height), max_number_len=2)),
-        self.counter_animation_by_state = CounterAnimation(5, 17)
-
-        self.counter_animation = self.counter_animation_by_state.duplicate()
+        self.animation = AnimationState(KING_ANIMATIONS)
 
-    def redraw_screen(self):
+    def update(self, dt=TICK):
         if self.default == self.bg:
-            anim = self.animation_by_state[0].right[self.counter_animation.animation_cnt]
-            self.win.blit(anim, (self.x, self.y))
+            self.animation.tick(dt)
 
-            self.counter_animation.tick()
+    def redraw_screen(self, alpha=1.0):
+        if self.default == self.bg:
+            anim = self.animation_by_state[0].right[self.animation.animation_cnt]
+            ox, oy = frame_offset(anim)
+            self.win.blit(anim, (self.x + ox, self.y + oy))
 
 
 class Character:
@@ -197,7 +260,7 @@ class Character:
 
     def __init__(self, x, y, screen, ch, back, weight, height, asset_directory):
         self.life = 15
-        self.char = pygame.transform.scale(pygame.image.load(asset_directory + ch), (weight, height))
+        self.char = asset_cache.load(asset_directory + ch, (weight, height))
         self.count = 0
         self.delta = 0
         self.on = False
@@ -213,181 +276,202 @@ class Character:
                        'Спасибо тебе за помощь.']
 
         self.animation_by_state = {
-            CharacterState.attack: MirrorAnimation(
-                pygame_load_image(0, 7,  os.path.join(asset_directory, "attack_{}.png"), (weight, height),
-                                  max_number_len=2)
-            ),
-            CharacterState.attack2: MirrorAnimation(
-                pygame_load_image(8, 7, os.path.join(asset_directory, "attack_{}.png"), (weight, height),
-                                  max_number_len=2)
-            ),
-            CharacterState.attack3: MirrorAnimation(
-                pygame_load_image(14, 7, os.path.join(asset_directory, "attack_{}.png"), (weight, height))
-            ),
-            CharacterState.idle: MirrorAnimation(
-                pygame_load_image(0, 15, os.path.join(asset_directory, "idle_{}.png"), (weight, height))
-            ),
-            CharacterState.walk: MirrorAnimation(
-               pygame_load_image(0, 8, os.path.join(asset_directory, "run_{}.png"), (weight, height))
-            ),
-            CharacterState.dead: MirrorAnimation(
-                pygame_load_image(0, 14, os.path.join(asset_directory, "death_{}.png"), (weight, height))
-            ),
-
+            state: MirrorAnimation(
+                *pygame_load_mirror(first, count, os.path.join(asset_directory, pattern), (weight, height),
+                                   max_number_len=number_len),
+                with_masks=True
+            )
+            for state, (first, count, pattern, number_len) in CHARACTER_FRAMES.items()
         }
+        for state in CHARACTER_PREWARMED:
+            self.animation_by_state[state].prewarm()
         self.animation_screen_state = 0
 
-        self.counter_animation_by_state = {
-            CharacterState.attack: CounterAnimation(
-                5, 7,
-                animation_end_function=lambda: self.set_state_force(CharacterState.idle),
-                whitelist_reset=(CharacterState.attack2,),
-            ),
-            CharacterState.attack2: CounterAnimation(
-                5, 7,
-                animation_end_function=lambda: self.set_state_force(CharacterState.idle),
-                whitelist_reset=(CharacterState.attack3,),
-            ),
-            CharacterState.attack3: CounterAnimation(
-                5, 7,
-                animation_end_function=lambda: self.set_state_force(CharacterState.idle),
-                whitelist_reset=(),
-            ),
-            CharacterState.idle: CounterAnimation(4, 15),
-            CharacterState.walk: CounterAnimation(5, 8),
-            CharacterState.dead: CounterAnimation(5, 14, freeze_on_end=True),
-        }
-
-        self.mirror_char = pygame.transform.flip(self.char, True, False)
         self.x = x
         self.y = y
-        self.char_rect = self.char.get_rect(topleft=(x, y))
+        self.prev_x = x
+        self.prev_y = y
+        self.char_rect = pygame.Rect((x, y), frame_size(self.char))
+        self.mask = self.animation_by_state[CharacterState.idle].masks(True)[0]
         self.win = screen
         self.attack_last = []
         self.vel = 5
         self.bg = back
         self.torf = False
         self.last_attack = None
+        self.landed = False
 
         self.direction = CharacterDirection.left
-        self.state = CharacterState.idle
-        self.counter_animation = self.counter_animation_by_state[self.state].duplicate()
+        self.animation = AnimationState(CHARACTER_ANIMATIONS, CharacterState.idle)
 
         self.time = 0.67
 
+    @property
+    def state(self) -> CharacterState:
+        return CHARACTER_ANIMATIONS.states[self.animation.state]
+
     def set_state_force(self, state):
-        if self.state != state:
-            self.state = state
-            self.counter_animation = self.counter_animation_by_state[self.state].duplicate()
+        self.animation.set_state_force(state.value)
 
     def set_state(self, state):
-        if self.counter_animation.access_reset(state):
-            self.set_state_force(state)
-            return True
-        else:
-            return False
-
-    def attack(self, enemy):
-        if self.char_rect.colliderect(enemy.rect):
-            return True
-        else:
-            return False
-
-    def redraw_screen(self):
+        return self.animation.set_state(state.value)
+
+    def swing(self, state):
+        if self.set_state(state):
+            self.landed = False
+
+    def striking(self):
+        # a swing lands at most once, on the first of its strike frames that touches something
+        frames = STRIKE_FRAMES.get(self.state)
+        return frames is not None and not self.landed and self.animation.animation_cnt in frames
+
+    def update(self, dt=TICK):
+        self.animation.tick(dt)
+        self.rotate.tick(dt)
+        # hitbox and mask follow the frame on screen, not the idle sprite
+        animation = self.animation_by_state[self.state]
+        cnt = self.animation.animation_cnt
+        self.char_rect = pygame.Rect((self.x, self.y), frame_size(animation.right[cnt]))
+        self.mask = animation.masks(self.direction == CharacterDirection.left)[cnt]
+
+    def remember_position(self):
+        self.prev_x = self.x
+        self.prev_y = self.y
+
+    def redraw_screen(self, alpha=1.0):
         if self.direction == CharacterDirection.left:
-            anim = self.animation_by_state[self.state].left[self.counter_animation.animation_cnt]
+            anim = self.animation_by_state[self.state].left[self.animation.animation_cnt]
         else:
-            anim = self.animation_by_state[self.state].right[self.counter_animation.animation_cnt]
+            anim = self.animation_by_state[self.state].right[self.animation.animation_cnt]
 
-        # anim = pygame.transform.rotate(anim, self.rotate.cur_eagle)
-        self.win.blit(anim, (self.x, self.y))
+        ox, oy = frame_offset(anim)
+        anim, (dx, dy) = rotation_cache.rotated(anim, self.rotate.cur_eagle)
+        self.win.blit(anim, (interpolate(self.prev_x, self.x, alpha) + ox + dx,
+                             interpolate(self.prev_y, self.y, alpha) + oy + dy), LAYER_PLAYER)
 
-        self.counter_animation.tick()
-        self.rotate.tick()
-        self.char_rect = self.char.get_rect(topleft=(self.x, self.y))
+
+def load_enemy_type(asset_directory, weight, height):
+    return EnemyType(
+        [
+            MirrorAnimation(
+                *pygame_load_mirror(0, 6, os.path.join(asset_directory, "idle_{}.png"), (weight, height)),
+                with_masks=True
+            ),
+            MirrorAnimation(
+                *pygame_load_mirror(0, 7, os.path.join(asset_directory, "dead_{}.png"), (weight, height)),
+                with_masks=True
+            ),
+            MirrorAnimation(
+                *pygame_load_mirror(0, 6, os.path.join(asset_directory, "walk_{}.png"), (weight, height)),
+                with_masks=True
+            ),
+            MirrorAnimation(
+                *pygame_load_mirror(0, 6, os.path.join(asset_directory, "attack_{}.png"), (weight, height)),
+                with_masks=True
+            ),
+        ],
+        ENEMY_ANIMATIONS,
+        (weight, height),
+    )
 
 
 class Enemy:
-    def __init__(self, x, y, weight, height, screen, asset_directory):
-        self.enemy = pygame.transform.scale(pygame.image.load(asset_directory + 'idle_0.png'), (weight, height))
-        self.x = x
-        self.y = y
+    # one enemy's view into an EnemyStore, the store owns its state and runs the AI for all of them at once
+    def __init__(self, x, y, weight, height, screen, asset_directory, store=None):
+        self.enemy = asset_cache.load(asset_directory + 'idle_0.png', (weight, height))
+        if store is None:
+            store = EnemyStore(load_enemy_type(asset_directory, weight, height), screen)
+        self.store = store
+        self.index = store.spawn(x, y)
         self.weight = weight
         self.quest = False
         self.height = height
         self.win = screen
         self.directory = asset_directory
         self.last_side = "left"
-        self.hp = 100
         self.bg = None
-        self.vel = 2
         self.def_bg = 'tamploin 2.0.png'
-        self.dead = False
-        self.rect = self.enemy.get_rect(topleft=(self.x, self.y))
-        self.rotate = RotateAnimation(15.0, 7)
 
-        self.animation_by_state = {
-            EnemyState.idle: MirrorAnimation(
-                pygame_load_image(0, 6, os.path.join(asset_directory, "idle_{}.png"), (weight, height))
-            ),
-            EnemyState.dead: MirrorAnimation(
-                pygame_load_image(0, 7, os.path.join(asset_directory, "dead_{}.png"), (weight, height))
-            ),
-            EnemyState.walk: MirrorAnimation(
-                pygame_load_image(0, 6, os.path.join(asset_directory, "walk_{}.png"), (weight, height))
-            ),
-            EnemyState.attack: MirrorAnimation(
-                pygame_load_image(0, 6, os.path.join(asset_directory, "attack_{}.png"), (weight, height))
-            ),
-        }
+    @property
+    def mask(self):
+        return self.store.frame_mask(self.index)
 
-        self.counter_animation_by_state = {
-            EnemyState.idle: CounterAnimation(9, 6),
-            EnemyState.dead: CounterAnimation(6, 7, freeze_on_end=True),
-            EnemyState.walk: CounterAnimation(12, 6),
-            EnemyState.attack: CounterAnimation(
-                5, 6,
-                animation_end_function=lambda: self.set_state_force(EnemyState.idle),
-                whitelist_reset=(EnemyState.attack,),
-            ),
-        }
+    @property
+    def angle(self):
+        # hit-shake tilt in degrees, eased back to zero by the store
+        return float(self.store.angle[self.index])
+
+    @property
+    def animation_by_state(self):
+        return {state: self.store.type.animations[state.value] for state in EnemyState}
 
-        self.direction = EnemyDirection.right
-        self.state = EnemyState.idle
-        self.counter_animation = self.counter_animation_by_state[self.state].duplicate()
+    @property
+    def x(self):
+        return int(self.store.x[self.index])
 
-    def set_state_force(self, state):
-        if self.state != state:
-            self.state = state
-            self.counter_animation = self.counter_animation_by_state[self.state].duplicate()
+    @x.setter
+    def x(self, value):
+        self.store.x[self.index] = value
 
-    def set_state(self, state):
-        if self.counter_animation.access_reset(state):
-            self.set_state_force(state)
-            return True
-        else:
-            return False
+    @property
+    def y(self):
+        return int(self.store.y[self.index])
 
-    def redraw_screen(self):
-        if self.bg == self.def_bg and self.quest:
-            if self.direction == EnemyDirection.left:
-                anim = self.animation_by_state[self.state].left[self.counter_animation.animation_cnt]
-            else:
-                anim = self.animation_by_state[self.state].right[self.counter_animation.animation_cnt]
+    @y.setter
+    def y(self, value):
+        self.store.y[self.index] = value
 
-            # anim = pygame.transform.rotate(anim, self.rotate.cur_eagle)
-            self.win.blit(anim, (self.x, self.y))
+    @property
+    def vel(self):
+        return int(self.store.vel[self.index])
+
+    @property
+    def hp(self):
+        return int(self.store.hp[self.index])
 
-            self.counter_animation.tick()
-            # self.rotate.tick()
-            self.rect = self.enemy.get_rect(topleft=(self.x, self.y))
+    @hp.setter
+    def hp(self, value):
+        self.store.hp[self.index] = value
 
-        else:
-            self.rect = self.enemy.get_rect(topleft=(-1000, -1000))
+    @property
+    def dead(self):
+        return bool(self.store.dead[self.index])
+
+    @dead.setter
+    def dead(self, value):
+        self.store.dead[self.index] = value
+
+    @property
+    def state(self):
+        return EnemyState(int(self.store.state[self.index]))
+
+    @property
+    def direction(self):
+        return EnemyDirection(int(self.store.direction[self.index]))
+
+    @direction.setter
+    def direction(self, value):
+        self.store.direction[self.index] = value.value
+
+    @property
+    def rect(self):
+        return pygame.Rect((int(self.store.rect_x[self.index]), int(self.store.rect_y[self.index])), frame_size(self.enemy))
+
+    def _mask(self):
+        mask = np.zeros(self.store.count, dtype=bool)
+        mask[self.index] = True
+        return mask
+
+    def set_state_force(self, state):
+        self.store.state[self.index] = state.value
+        self.store.ticks[self.index] = 0
+
+    def set_state(self, state):
+        return bool(self.store.set_state(self._mask(), state.value)[self.index])
 
 
 class World:
-    def __init__(self, screen, char_x, char_y, bg):
+    def __init__(self, screen, char_x, char_y, bg, collisions=None):
         self.last_tp = None
         self.bg = bg
         self.def_bg = 'tamploin 2.0.png'
@@ -399,37 +483,43 @@ class World:
         self.left_rect = pygame.Rect(-100, 315, 20, char_y)
         self.in_tavern = False
 
+        # characters are looked up against these trigger zones through the broadphase
+        self.collisions = CollisionWorld() if collisions is None else collisions
+        self.collisions.add('tavern', self.tavern_rect, trigger=True)
+        self.collisions.add('right_edge', self.right_rect, trigger=True)
+        self.collisions.add('left_edge', self.left_rect, trigger=True)
+
     def is_collided(self, character, last):
         if not self.in_tavern:
-            if self.last_tp == "right" and self.left_rect.colliderect(character.char_rect):
+            hits = self.collisions.overlaps(character)
+            if self.last_tp == "right" and 'left_edge' in hits:
                 return 0
-            elif self.last_tp == "left" and self.right_rect.colliderect(character.char_rect):
+            elif self.last_tp == "left" and 'right_edge' in hits:
                 return 0
             else:
                 self.last_tp = None
-            if self.right_rect.colliderect(character.char_rect) and last < 2:
+            if 'right_edge' in hits and last < 2:
                 self.last_tp = "right"
                 character.x = -60
                 return 1
-            elif self.left_rect.colliderect(character.char_rect) and last != 0:
+            elif 'left_edge' in hits and last != 0:
                 self.last_tp = "left"
                 character.x = 900
                 return -1
             else:
-                self.right_rect = pygame.Rect(1100, 315, 20, game.char_y)
-                self.left_rect = pygame.Rect(-100, 315, 20, game.char_y)
                 return 0
         else:
             return 0
 
     def tavern(self, character):
-        if self.tavern_rect.colliderect(character.char_rect) and self.bg == self.def_bg and not self.in_tavern:
-            logging.info('tavern')
+        at_door = 'tavern' in self.collisions.overlaps(character)
+        if at_door and self.bg == self.def_bg and not self.in_tavern:
+            world_log.info('tavern')
             self.in_tavern = True
             character.y = 290
             return 3
-        elif self.tavern_rect.colliderect(character.char_rect) and self.bg == 'tavern.png' and self.in_tavern:
-            logging.info('tavern')
+        elif at_door and self.bg == 'tavern.png' and self.in_tavern:
+            world_log.info('tavern')
             self.in_tavern = False
             character.y = 360
             character.x = 720
@@ -441,225 +531,479 @@ class World:
             return 2
 
 
-logging.basicConfig(level=logging.DEBUG)
-
-win = pygame.display.set_mode((1012, 576))
-pygame.display.set_caption("The Witcher 4 Flat World")
-pygame.display.set_caption("The Witcher 4 Flat World")
-bg = pygame.image.load(ASSET_DIRECTORY + 'Castle_5.png')
-bg = pygame.transform.scale(bg, (1012, 576))
-bgs_names = ['Castle_5.png', 'menu.jpg', 'tamploin 2.0.png', 'tavern.png']
-bgs = [pygame.image.load(ASSET_DIRECTORY + 'Castle_5.png'), pygame.image.load(
-    ASSET_DIRECTORY + 'Forest.png'), pygame.transform.scale(pygame.image.load(ASSET_DIRECTORY+'tamploin 2.0.png'), (1012, 576)), pygame.image.load(ASSET_DIRECTORY + 'tavern_3.png')]
-width = 0
-clock = pygame.time.Clock()
-last = 0
-run = True
-last_r = 0
-end = False
-king = King(100, 285, win, 370, 370, ASSET_DIRECTORY_KING)
-char = Character(450, 360, win, 'idle_00.png', bg, 210, 210, ASSET_DIRECTORY_CHARACTER)
-enem = Enemy(500, 255, 350, 280, win, ASSET_DIRECTORY_ENEMY)
-keir = Keir(400, 310, win, 128, 128, ASSET_DIRECTORY_KEIR)
-game = World(win, 210, 210, bg)
-n_text = 2
-pygame.mixer.music.load(ASSET_DIRECTORY + 'Kaer Morhen.mp3')
-pygame.mixer.music.play()
-
-while run:
-    clock.tick(56)
-    win.blit(bg, (0, 0))
-    king.redraw_screen()
-    pressed_attack = False
-    space = False
-
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            run = False
-
-        if event.type == pygame.KEYDOWN and event.unicode == 'u':
-            pressed_attack = True
-
-        if event.type == pygame.KEYDOWN and event.unicode == 'q':
-            if bgs_names[last] == 'tamploin 2.0.png' or bgs_names[last] == 'tavern.png':
-                last = game.tavern(char)
-
-        if event.type == pygame.KEYDOWN and event.unicode == ' ':
-            if char.quest:
-                if n_text % 2 == 0:
-                    king.n_text += 1
-                if n_text % 2 != 0:
-                    char.n_text += 1
-                n_text += 1
-            elif char.quest_2:
-                if n_text % 2 == 0:
-                    char.n_text += 1
-                if n_text % 2 != 0:
-                    keir.n_text += 1
-                n_text += 1
-        logging.info(event)
-
-    if end:
-        char.set_state(CharacterState.idle)
-    elif char.quest and char.life > 0:
-        king.win.blit(pygame.transform.scale(pygame.image.load(ASSET_DIRECTORY + 'panel.png'), (900, 300)), (56, -50))
-        char.set_state(CharacterState.idle)
-        keys = pygame.key.get_pressed()
-        if n_text == 7:
-            n_text = 1
-            char.n_text = 0
-            king.showed = True
-            char.quest = False
-        if n_text % 2 == 0:
-            myfont = pygame.font.Font(ASSET_DIRECTORY + 'pixel.ttf', 20)
-            textsurface = myfont.render(king.text[king.n_text], False, (0, 0, 0))
-            textsurface_2 = myfont.render('Король:', False, (0, 0, 0))
-            win.blit(textsurface, (150, 85))
-            win.blit(textsurface_2, (150, 35))
-        elif n_text % 2 != 0:
-            myfont = pygame.font.Font(ASSET_DIRECTORY + 'pixel.ttf', 20)
-            textsurface = myfont.render(char.text[char.n_text], False, (0, 0, 0))
-            textsurface_2 = myfont.render('Геральт:', False, (0, 0, 0))
-            win.blit(textsurface, (150, 85))
-            win.blit(textsurface_2, (150, 35))
-
-    elif char.quest_2 and char.life > 0:
-        keir.win.blit(pygame.transform.scale(pygame.image.load(ASSET_DIRECTORY + 'panel.png'), (900, 300)), (56, -50))
-        char.set_state(CharacterState.idle)
-        keys = pygame.key.get_pressed()
-        print(n_text)
-        if n_text == 5:
-            keir.showed = True
-            char.quest_2 = False
-            enem.quest = True
-        if n_text % 2 == 0:
-            myfont = pygame.font.Font(ASSET_DIRECTORY + 'pixel.ttf', 20)
-            textsurface = myfont.render(char.text_2[char.n_text], False, (0, 0, 0))
-            textsurface_2 = myfont.render('Геральт:', False, (0, 0, 0))
-            win.blit(textsurface, (150, 85))
-            win.blit(textsurface_2, (150, 35))
-        elif n_text % 2 != 0:
-            myfont = pygame.font.Font(ASSET_DIRECTORY + 'pixel.ttf', 20)
-            textsurface = myfont.render(keir.text[keir.n_text], False, (0, 0, 0))
-            textsurface_2 = myfont.render('Кейр:', False, (0, 0, 0))
-            win.blit(textsurface, (150, 85))
-            win.blit(textsurface_2, (150, 35))
-
-    elif char.life > 0:
-        if pressed_attack:
-            logging.info("key pressed attack.")
-            if char.state == CharacterState.idle:
-                if char.attack(enem):
-                    enem.hp -= 35
-                    enem.rotate.rotate()
-                    if enem.hp <= 0:
-                        enem.set_state(EnemyState.dead)
-                        enem.dead = True
-                        logging.info("Death")
-                char.set_state(CharacterState.attack)
-            elif char.state == CharacterState.attack:
-                if char.attack(enem):
-                    enem.hp -= 35
-                    enem.rotate.rotate()
-                    if enem.hp <= 0:
-                        enem.set_state(EnemyState.dead)
-                        enem.dead = True
-                        logging.info("Death")
-                char.set_state(CharacterState.attack2)
-            elif char.state == CharacterState.attack2:
-                if char.attack(enem):
-                    enem.hp -= 35
-                    enem.rotate.rotate()
-                    if enem.hp <= 0:
-                        enem.set_state(EnemyState.dead)
-                        enem.dead = True
-                        logging.info("Death")
-                char.set_state(CharacterState.attack3)
-        else:
-            keys = pygame.key.get_pressed()
+class Inputs:
+    # bit order of the recorded input log, never reorder, only append
+    FIELDS = ('left', 'right', 'attack', 'tavern', 'talk', 'quit')
 
-            if keys[pygame.K_a] and char.x > char.vel - 200:
-                logging.info("key pressed walk left.")
+    def __init__(self, left=False, right=False, attack=False, tavern=False, talk=False, quit=False, overlay=False):
+        self.left = left
+        self.right = right
+        self.attack = attack
+        self.tavern = tavern
+        self.talk = talk
+        self.quit = quit
+        self.overlay = overlay
 
-                if char.set_state(CharacterState.walk):
-                    char.direction = CharacterDirection.left
-                    char.x -= char.vel
+    @classmethod
+    def poll(cls):
+        inputs = cls()
 
-            elif keys[pygame.K_d] and char.x < 1100 - char.vel:
-                logging.info("key pressed walk right.")
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                inputs.quit = True
 
-                if char.set_state(CharacterState.walk):
-                    char.x += char.vel
-                    char.direction = CharacterDirection.right
+            if event.type == pygame.KEYDOWN and event.unicode == 'u':
+                inputs.attack = True
 
-            else:
-                char.set_state(CharacterState.idle)
-
-    if enem.dead:
-        enem.set_state(EnemyState.dead)
-    elif enem.bg == enem.def_bg and enem.quest:
-        if abs(char.x - enem.x) <= 30 and enem.direction == EnemyDirection.left:
-            if char.life > 0:
-                enem.set_state(EnemyState.attack)
-                if char.rotate.cur_eagle < 0.1:
-                    char.rotate.rotate()
-                    char.life -= 1
-            else:
-                enem.set_state(EnemyState.idle)
+            if event.type == pygame.KEYDOWN and event.unicode == 'q':
+                inputs.tavern = True
 
-        # elif char.x - enem.x >= 30 and enem.direction == EnemyDirection.right:
-        #     enem.set_state(EnemyState.attack)
+            if event.type == pygame.KEYDOWN and event.unicode == ' ':
+                inputs.talk = True
 
-        elif enem.rect.colliderect(char.char_rect) and enem.state != 1:
-            if char.x < enem.x:
-                logging.info("enemy walk left.")
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                inputs.overlay = True
+            events_log.debug(event)
+
+        keys = pygame.key.get_pressed()
+        inputs.left = bool(keys[pygame.K_a])
+        inputs.right = bool(keys[pygame.K_d])
+        return inputs
+
+    def merged(self, other):
+        return Inputs(self.left, self.right, self.attack or other.attack, self.tavern or other.tavern,
+                      self.talk or other.talk, self.quit or other.quit)
+
+    def held(self):
+        return Inputs(self.left, self.right, quit=self.quit)
+
+    def to_bits(self):
+        bits = 0
+        for i, field in enumerate(self.FIELDS):
+            if getattr(self, field):
+                bits |= 1 << i
+        return bits
+
+    @classmethod
+    def from_bits(cls, bits):
+        return cls(*(bool(bits >> i & 1) for i in range(len(cls.FIELDS))))
+
+
+def make_scenes():
+    music = ASSET_DIRECTORY + 'Kaer Morhen.mp3'
+    return [
+        Scene('Castle_5.png', ASSET_DIRECTORY + 'Castle_5.png', actors=('king',), music=music),
+        Scene('Forest.png', ASSET_DIRECTORY + 'Forest.png', music=music),
+        Scene('tamploin 2.0.png', ASSET_DIRECTORY + 'tamploin 2.0.png', actors=('enem',), music=music),
+        Scene('tavern.png', ASSET_DIRECTORY + 'tavern_3.png', actors=('keir',), music=music),
+    ]
+
+
+def prewarm_assets(cache=asset_cache):
+    # decodes and scales everything Game loads, safe to run on a thread before any window exists:
+    # sprites stay in the cache unconverted until Game calls convert_all, backgrounds land in the disk cache
+    if cache.disk_cache is None:
+        cache.disk_cache = SpriteDiskCache()
+    for name, size in ATLAS_SPECS.items():
+        cache.load_many(sorted(glob.glob(os.path.join(ASSET_DIRECTORY, name, '*.png'))), size)
+    for state in CHARACTER_PREWARMED:
+        first, count, pattern, number_len = CHARACTER_FRAMES[state]
+        cache.load_many(sequence_paths(first, count, ASSET_DIRECTORY_CHARACTER + pattern, number_len),
+                        ATLAS_SPECS['character'], flip=True)
+    for scene in make_scenes():
+        if cache.disk_cache.get(scene.background_path, scene.size, lambda raw: raw) is None:
+            decode_background(scene.background_path, scene.size, cache.disk_cache)
+    log.debug("prewarmed %d sprites", len(cache))
+
+
+class Game:
+    def __init__(self, headless=False, fps=56, profile=None, enemies=0, record=None, render_scale=1.0,
+                 watch=False):
+        self.headless = headless
+        self.fps = fps
+        # development mode, edited sprites and backgrounds are swapped in between frames
+        self.watcher = None
+        if watch:
+            self.watcher = AssetWatcher([ASSET_DIRECTORY] + [os.path.join(ASSET_DIRECTORY, name)
+                                                             for name in ATLAS_SPECS])
+        # 'auto' picks the internal render resolution from recent render times, a number fixes it
+        self.resolution = None
+        if render_scale == 'auto':
+            self.resolution = ResolutionGovernor(RENDER_SHARE * 1000 / (fps or SIMULATION_RATE))
+            render_scale = self.resolution.scale
+        # every tick's inputs go to the log, together with the setup needed to play it back identically
+        self.recorder = None if record is None else InputRecorder(record, enemies)
+        # F3 shows the overlay at any time, --profile also records from the start and exports on exit
+        self.profile = profile
+        self.profiler = FrameProfiler(enabled=profile is not None)
+        if headless:
+            os.environ['SDL_VIDEODRIVER'] = 'dummy'
+            os.environ['SDL_AUDIODRIVER'] = 'dummy'
+
+        pygame.init()
+        self.win = pygame.display.set_mode((1012, 576))
+        self.renderer = ScaledRenderer(self.win, render_scale)
+        asset_cache.workers = os.cpu_count() or 1
+        if asset_cache.disk_cache is None:
+            asset_cache.disk_cache = SpriteDiskCache()
+        asset_cache.convert_all()
+        pygame.display.set_caption("The Witcher 4 Flat World")
+        # backgrounds are streamed by the scene manager, only the current scene and its neighbors stay loaded
+        self.scenes = SceneManager(make_scenes(), disk_cache=asset_cache.disk_cache)
+        self.bg = self.scenes.go(0).background
+        self.clock = pygame.time.Clock()
+        self.last = 0
+        self.running = True
+        self.last_r = 0
+        self.end = False
+        self.ticks = 0
+        # actors draw through the renderer so it can track what changed between frames
+        self.king = King(100, 285, self.renderer, 370, 370, ASSET_DIRECTORY_KING)
+        self.char = Character(450, 360, self.renderer, 'idle_00.png', self.bg, 210, 210, ASSET_DIRECTORY_CHARACTER)
+        self.enem = Enemy(500, 255, 350, 280, self.renderer, ASSET_DIRECTORY_ENEMY)
+        self.enemies = self.enem.store
+        for i in range(enemies):
+            self.enemies.spawn(-100 + (i * 37) % 1100, 255)
+        self.keir = Keir(400, 310, self.renderer, 128, 128, ASSET_DIRECTORY_KEIR)
+        shutdown_workers()
+        self.collisions = CollisionWorld()
+        self.world = World(self.win, 210, 210, self.bg, self.collisions)
+        self.actors = {'king': self.king, 'enem': self.enemies, 'keir': self.keir}
+        self.sync_hitboxes()
+        self.collisions.listen(self.king, on_enter=self.meet_king)
+        self.collisions.listen(self.keir, on_enter=self.meet_keir)
+        self.n_text = 2
+        self.dialogue = None
+        self.text_renderer = TextRenderer(ASSET_DIRECTORY + 'pixel.ttf', ASSET_DIRECTORY + 'panel.png')
+
+        # sounds are decoded here once, playing them during combat is only a channel lookup
+        self.audio = AudioManager(enabled=not headless)
+        self.audio.load('hit', ASSET_DIRECTORY + 'hit 1.mp3')
+        self.audio.load('death', ASSET_DIRECTORY + 'hit 2.mp3')
+        self.audio.play_music(self.scenes.current.music)
+
+    def animations(self) -> List[MirrorAnimation]:
+        return (list(self.char.animation_by_state.values()) + self.enemies.type.animations
+                + list(self.king.animation_by_state) + list(self.keir.animation_by_state))
+
+    def reload_assets(self, paths: Iterable[str]):
+        for path in paths:
+            start = perf_counter()
+            try:
+                replaced = asset_cache.reload(path)
+                scenes = self.scenes.reload(path)
+            except (pygame.error, OSError) as e:
+                log.warning("could not reload %s: %s", path, e)
+                self.watcher.retry(path)
+                continue
+
+            if replaced:
+                for animation in self.animations():
+                    animation.replace(replaced)
+                for owner, name in ((self.char, 'char'), (self.enem, 'enemy'),
+                                    (self.king, 'king_sprite'), (self.keir, 'keir_sprite')):
+                    setattr(owner, name, replaced.get(getattr(owner, name), getattr(owner, name)))
+                for old in replaced:
+                    rotation_cache.discard(old)
+            if self.scenes.current in scenes:
+                self.bg = self.scenes.current.background
+            if replaced or scenes:
+                log.info("reloaded %s in %.1f ms", os.path.basename(path), (perf_counter() - start) * 1000)
+
+    def sync_hitboxes(self):
+        self.collisions.move(self.char, self.char.char_rect)
+        self.collisions.move(self.king, self.king.rect)
+        self.collisions.move(self.enem, self.enem.rect)
+        self.collisions.move(self.keir, self.keir.rect)
+
+    def meet_king(self, king, actor):
+        if actor is self.char and not king.showed:
+            self.char.quest = True
+
+    def meet_keir(self, keir, actor):
+        if actor is self.char and not keir.showed:
+            self.char.quest_2 = True
+
+    def hit_enemy(self):
+        char = self.char
+
+        alive = ~self.enemies.view('dead')
+        hit = self.enemies.hit(char.char_rect, 35, char.mask)
+        if hit.any():
+            char.landed = True
+        killed = hit & alive & self.enemies.view('dead')
+        if killed.any():
+            combat_log.info("Death")
+            self.audio.play('death', priority=2)
+        elif (hit & alive).any():
+            self.audio.play('hit', priority=1)
+
+    def step(self, inputs: Inputs):
+        char, enem, king, keir = self.char, self.enem, self.king, self.keir
+        if self.recorder is not None:
+            self.recorder.record(inputs.to_bits())
+        self.ticks += 1
+        self.dialogue = None
+        char.remember_position()
+        self.enemies.remember_position()
+        self.profiler.mark('input')
+        king.update(TICK)
+        self.profiler.mark('animation')
+
+        if inputs.quit:
+            self.running = False
+
+        if inputs.tavern:
+            if self.scenes[self.last].name == 'tamploin 2.0.png' or self.scenes[self.last].name == 'tavern.png':
+                self.last = self.world.tavern(char)
+                self.renderer.invalidate()
+
+        if inputs.talk:
+            if char.quest:
+                if self.n_text % 2 == 0:
+                    king.n_text += 1
+                if self.n_text % 2 != 0:
+                    char.n_text += 1
+                self.n_text += 1
+            elif char.quest_2:
+                if self.n_text % 2 == 0:
+                    char.n_text += 1
+                if self.n_text % 2 != 0:
+                    keir.n_text += 1
+                self.n_text += 1
+            dialogue_log.debug("dialogue line %d", self.n_text)
+
+        if self.end:
+            char.set_state(CharacterState.idle)
+        elif char.quest and char.life > 0:
+            char.set_state(CharacterState.idle)
+            if self.n_text == 7:
+                self.n_text = 1
+                char.n_text = 0
+                king.showed = True
+                char.quest = False
+            if self.n_text % 2 == 0:
+                self.dialogue = ('Король:', king.text[king.n_text])
+            elif self.n_text % 2 != 0:
+                self.dialogue = ('Геральт:', char.text[char.n_text])
+
+        elif char.quest_2 and char.life > 0:
+            char.set_state(CharacterState.idle)
+            if self.n_text == 5:
+                keir.showed = True
+                char.quest_2 = False
+                enem.quest = True
+            if self.n_text % 2 == 0:
+                self.dialogue = ('Геральт:', char.text_2[char.n_text])
+            elif self.n_text % 2 != 0:
+                self.dialogue = ('Кейр:', keir.text[keir.n_text])
+
+        elif char.life > 0:
+            if inputs.attack:
+                input_log.debug("key pressed attack.")
+                if char.state == CharacterState.idle:
+                    char.swing(CharacterState.attack)
+                elif char.state == CharacterState.attack:
+                    char.swing(CharacterState.attack2)
+                elif char.state == CharacterState.attack2:
+                    char.swing(CharacterState.attack3)
+            else:
+                if inputs.left and char.x > char.vel - 200:
+                    input_log.debug("key pressed walk left.")
 
-                if enem.set_state(EnemyState.walk):
-                    enem.direction = EnemyDirection.left
-                    enem.x -= enem.vel
+                    if char.set_state(CharacterState.walk):
+                        char.direction = CharacterDirection.left
+                        char.x -= char.vel
 
-            elif char.x > enem.x:
-                logging.info("enemy walk right.")
+                elif inputs.right and char.x < 1100 - char.vel:
+                    input_log.debug("key pressed walk right.")
 
-                if enem.set_state(EnemyState.walk):
-                    enem.x += enem.vel
-                    enem.direction = EnemyDirection.right
+                    if char.set_state(CharacterState.walk):
+                        char.x += char.vel
+                        char.direction = CharacterDirection.right
 
-        else:
-            enem.set_state(EnemyState.idle)
-
-    if king.rect.colliderect(char.char_rect) and not king.showed:
-        char.quest = True
-
-    if keir.rect.colliderect(char.char_rect) and not keir.showed:
-        char.quest_2 = True
-
-    enem.redraw_screen()
-    keir.redraw_screen()
-    char.redraw_screen()
-    last_r = last + game.is_collided(char, last_r)
-    bg = bgs[last_r]
-    enem.bg = bgs_names[last_r]
-    king.bg = bgs_names[last_r]
-    game.bg = bgs_names[last_r]
-    keir.bg = bgs_names[last_r]
-    # if game.in_tavern:
-    #     win.blit(pygame.image.load(ASSET_DIRECTORY + 'tavern_tree.png'), (0, 0))
-    last = last_r
-
-    if enem.hp <= 0:
-        myfont = pygame.font.Font(ASSET_DIRECTORY + 'pixel.ttf', 100)
-        textsurface = myfont.render('Конец', False, (255, 255, 255))
-        win.blit(textsurface, (350, 200))
-        end = True
-
-    if char.life <= 0:
-        char.set_state_force(CharacterState.dead)
-        char.rotate = StrictRotate(0)
-        myfont = pygame.font.Font(ASSET_DIRECTORY + 'pixel.ttf', 100)
-        textsurface = myfont.render('Вы проиграли', False, (255, 255, 255))
-        win.blit(textsurface, (150, 200))
-
-    pygame.display.update()
-
-pygame.quit()
+                else:
+                    char.set_state(CharacterState.idle)
+
+        self.profiler.mark('input')
+        self.collisions.update_contacts(char)
+        self.profiler.mark('collision')
+
+        self.enemies.visible = enem.bg == enem.def_bg and enem.quest
+        if self.enemies.think(char.x, char.char_rect, char.life > 0):
+            if char.rotate.cur_eagle < 0.1:
+                char.rotate.rotate()
+                char.life -= 1
+
+        self.enemies.update()
+        self.profiler.mark('enemies')
+        keir.update(TICK)
+        char.update(TICK)
+        self.profiler.mark('animation')
+        if char.striking():
+            self.hit_enemy()
+        self.sync_hitboxes()
+        self.last_r = self.last + self.world.is_collided(char, self.last_r)
+        if self.last_r != self.last:
+            self.renderer.invalidate()
+        self.profiler.mark('collision')
+        scene = self.scenes.go(self.last_r)
+        self.audio.play_music(scene.music)
+        self.profiler.mark('scene')
+        self.bg = scene.background
+        enem.bg = scene.name
+        king.bg = scene.name
+        self.world.bg = scene.name
+        keir.bg = scene.name
+        self.last = self.last_r
+
+        if enem.hp <= 0:
+            self.end = True
+
+        if char.life <= 0:
+            char.set_state_force(CharacterState.dead)
+            char.rotate = StrictRotate(0)
+
+        self.profiler.mark('state')
+        return self.running
+
+    def render(self, alpha=1.0):
+        if self.headless:
+            return
+
+        # everything is queued with its layer and drawn in one pass by flush, so submission order is free
+        self.renderer.begin(self.bg)
+        self.char.redraw_screen(alpha)
+        for name in self.scenes.current.actors:
+            self.actors[name].redraw_screen(alpha)
+        if self.dialogue is not None:
+            self.renderer.blit(self.text_renderer.dialogue_panel(*self.dialogue), PANEL_POSITION, LAYER_DIALOGUE)
+        # if self.world.in_tavern:
+        #     self.renderer.blit(pygame.image.load(ASSET_DIRECTORY + 'tavern_tree.png'), (0, 0))
+
+        if self.enem.hp <= 0:
+            self.renderer.blit(self.text_renderer.render('Конец', (255, 255, 255), 100), (350, 200), LAYER_TEXT)
+
+        if self.char.life <= 0:
+            self.renderer.blit(self.text_renderer.render('Вы проиграли', (255, 255, 255), 100), (150, 200), LAYER_TEXT)
+
+        overlay = self.profiler.overlay(self.text_renderer)
+        if overlay is not None:
+            self.renderer.blit(overlay, OVERLAY_POSITION, LAYER_OVERLAY)
+        self.profiler.mark('draw')
+        self.renderer.flush()
+        self.profiler.mark('flush')
+
+    def simulate(self, inputs: Iterable[Inputs]):
+        for tick_inputs in inputs:
+            if not self.step(tick_inputs):
+                break
+        return self.ticks
+
+    def run(self, max_ticks=None, inputs=None):
+        # inputs, when given, is an iterator of per-tick Inputs that replaces the keyboard
+        accumulator = 0.0
+        pending = Inputs()
+
+        profiler = self.profiler
+
+        while self.running and (max_ticks is None or self.ticks < max_ticks):
+            profiler.begin_frame()
+            if self.headless:
+                tick_inputs = Inputs() if inputs is None else next(inputs, None)
+                if tick_inputs is None:
+                    break
+                self.step(tick_inputs)
+                profiler.end_frame()
+                continue
+
+            accumulator += min(self.clock.tick(self.fps) / 1000, MAX_FRAME_TIME)
+            profiler.mark('wait')
+            polled = Inputs.poll()
+            if polled.overlay:
+                profiler.toggle_overlay()
+            if inputs is not None:
+                self.running = not polled.quit
+            # key presses survive until a step consumes them, even on frames that run no step
+            pending = polled.merged(pending)
+            profiler.mark('events')
+            if self.watcher is not None:
+                self.reload_assets(self.watcher.poll())
+                profiler.mark('reload')
+            while accumulator >= TICK and self.running:
+                if inputs is None:
+                    self.step(pending)
+                    pending = pending.held()
+                else:
+                    tick_inputs = next(inputs, None)
+                    if tick_inputs is None:
+                        self.running = False
+                        break
+                    self.step(tick_inputs)
+                accumulator -= TICK
+            self.audio.update()
+            start = perf_counter()
+            self.render(accumulator / TICK)
+            if self.resolution is not None:
+                scale = self.resolution.record((perf_counter() - start) * 1000)
+                if scale != self.renderer.scale:
+                    log.info("render scale %d%%", scale * 100)
+                    self.renderer.set_scale(scale)
+            profiler.end_frame()
+
+        self.close()
+
+    def close(self):
+        if self.recorder is not None:
+            self.recorder.close()
+            log.info("%d ticks of input recorded to %s", self.recorder.ticks, self.recorder.path)
+        if self.profile is not None:
+            self.profiler.export(self.profile)
+            log.info("profile written to %s", self.profile)
+        self.scenes.close()
+        self.audio.stop()
+        pygame.quit()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="The Witcher 4 Flat World")
+    parser.add_argument('--headless', action='store_true', help="simulate without a window, as fast as possible")
+    parser.add_argument('--ticks', type=int, default=None, help="stop after this many simulation ticks")
+    parser.add_argument('--fps', type=int, default=56, help="render frame rate cap, 0 for uncapped")
+    parser.add_argument('--enemies', type=int, default=0, help="extra enemies to spawn in the quest scene")
+    parser.add_argument('--profile', metavar='PATH', default=None,
+                        help="record per-phase frame timings and write p50/p95/p99 to a .json or .csv file on exit")
+    parser.add_argument('--record', metavar='PATH', default=None,
+                        help="write every tick's input to a log that game_witcher.replay can play back")
+    parser.add_argument('--compact', action='store_true',
+                        help="keep sprites trimmed to their opaque bounding box, for low-memory machines")
+    parser.add_argument('--watch', action='store_true',
+                        help="reload sprites and backgrounds when their files change, for editing assets")
+    parser.add_argument('--render-scale', default='1.0', metavar='SCALE',
+                        help="internal render resolution as a fraction of the window, 1 or 0.5, or 'auto' to "
+                             "adapt it to render times")
+    parser.add_argument('--log-level', default=None, help="overall log level, INFO by default and WARNING headless")
+    parser.add_argument('--log', metavar='CATEGORY=LEVEL', action='append', default=[],
+                        help="level for one category (game, input, events, combat, world, dialogue), "
+                             "e.g. --log input=DEBUG")
+    args = parser.parse_args(argv)
+    if args.render_scale != 'auto':
+        try:
+            args.render_scale = float(args.render_scale)
+        except ValueError:
+            parser.error("--render-scale takes 'auto' or a number")
+
+    try:
+        categories = parse_levels(args.log)
+    except ValueError as e:
+        parser.error(str(e))
+    setup_logging(args.log_level.upper() if args.log_level else logging.WARNING if args.headless else logging.INFO,
+                  categories)
+    asset_cache.compact = args.compact
+    game = Game(headless=args.headless, fps=args.fps, profile=args.profile, enemies=args.enemies, record=args.record,
+                render_scale=args.render_scale, watch=args.watch)
+    game.run(args.ticks)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+import os
+
+from time import perf_counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+POLL_INTERVAL = 0.5
+
+Stamp = Tuple[int, int]
+
+
+class AssetWatcher:
+    # polls modification times and sizes, which needs nothing beyond os and behaves the same on every platform
+    def __init__(self, directories: Sequence[str], interval: float = POLL_INTERVAL,
+                 extensions: Tuple[str, ...] = ('.png',)):
+        self.directories = [os.path.normpath(os.path.abspath(directory)) for directory in directories]
+        self.interval = interval
+        self.extensions = extensions
+        self._next = 0.0
+        self._seen = self._scan()
+
+    def _scan(self) -> Dict[str, Stamp]:
+        found: Dict[str, Stamp] = {}
+        for directory in self.directories:
+            try:
+                entries = os.scandir(directory)
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    if entry.name.lower().endswith(self.extensions) and entry.is_file():
+                        stat = entry.stat()
+                        found[entry.path] = (stat.st_mtime_ns, stat.st_size)
+        return found
+
+    def poll(self, now: Optional[float] = None) -> List[str]:
+        # paths added or changed since the last scan, at most one scan per interval
+        now = perf_counter() if now is None else now
+        if now < self._next:
+            return []
+        self._next = now + self.interval
+
+        seen = self._scan()
+        changed = sorted(path for path, stamp in seen.items() if self._seen.get(path) != stamp)
+        self._seen = seen
+        return changed
+
+    def retry(self, path: str):
+        # reported again by the next scan, for files that could not be read yet
+        self._seen.pop(path, None)
@@ -0,0 +1,75 @@
+import struct
+
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+from game_witcher.animation import SIMULATION_RATE
+
+
+# a log is a header followed by (run length, input bits) records, one run per stretch of identical ticks
+MAGIC = b'GWIR'
+VERSION = 1
+HEADER = struct.Struct('<4sBHH')
+RUN = struct.Struct('<HB')
+MAX_RUN = 0xFFFF
+
+
+class InputRecorder:
+    def __init__(self, path: str, enemies: int = 0, rate: int = SIMULATION_RATE):
+        self.path = path
+        self.ticks = 0
+        self._file: Optional[BinaryIO] = open(path, 'wb')
+        self._file.write(HEADER.pack(MAGIC, VERSION, rate, enemies))
+        self._bits = -1
+        self._run = 0
+
+    def record(self, bits: int):
+        if bits == self._bits and self._run < MAX_RUN:
+            self._run += 1
+        else:
+            self._flush()
+            self._bits = bits
+            self._run = 1
+        self.ticks += 1
+
+    def _flush(self):
+        if self._run:
+            self._file.write(RUN.pack(self._run, self._bits))
+
+    def close(self):
+        if self._file is None:
+            return
+        self._flush()
+        self._run = 0
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class InputLog:
+    def __init__(self, runs: List[Tuple[int, int]], enemies: int = 0, rate: int = SIMULATION_RATE):
+        self.runs = runs
+        self.enemies = enemies
+        self.rate = rate
+
+    @classmethod
+    def open(cls, path: str) -> 'InputLog':
+        with open(path, 'rb') as file:
+            data = file.read()
+        magic, version, rate, enemies = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("{} is not an input log this version can read".format(path))
+        if (len(data) - HEADER.size) % RUN.size:
+            raise ValueError("{} is truncated".format(path))
+        return cls(list(RUN.iter_unpack(data[HEADER.size:])), enemies, rate)
+
+    def __len__(self):
+        return sum(run for run, _ in self.runs)
+
+    def __iter__(self) -> Iterator[int]:
+        for run, bits in self.runs:
+            for _ in range(run):
+                yield bits
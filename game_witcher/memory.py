@@ -0,0 +1,129 @@
+import argparse
+import json
+import os
+import sys
+
+from typing import Dict, Iterable, List, Optional
+from game_witcher.game import ASSET_DIRECTORY, EnemyState, Game
+from game_witcher.rotation import rotation_cache
+from game_witcher.utils import AssetCache, LazyFrames, asset_cache, surface_bytes
+
+
+MB = 1024 * 1024
+
+
+def mask_bytes(mask) -> int:
+    width, height = mask.get_size()
+    return (width + 7) // 8 * height
+
+
+def frame_bytes(surface) -> int:
+    # atlas frames are charged their area of the sheet, so the bytes land on their own directory and state
+    if surface.get_parent() is None:
+        return surface_bytes(surface)
+    return surface.get_width() * surface.get_height() * surface.get_bytesize()
+
+
+def frames_bytes(frames: Iterable) -> int:
+    return sum(frame_bytes(frame) for frame in frames)
+
+
+def animation_report(animation) -> Dict[str, int]:
+    # mirrored frames are counted only once they have been built
+    left = animation.left.loaded_frames() if isinstance(animation.left, LazyFrames) else list(animation.left)
+    masks = list(animation.right_masks or [])
+    if animation.left_masks is not None:
+        masks += animation.left_masks.loaded_frames()
+    return {
+        'frames': len(animation.right),
+        'mirrored_loaded': len(left),
+        'bytes': frames_bytes(animation.right),
+        'mirrored_bytes': frames_bytes(left),
+        'mask_bytes': sum(mask_bytes(mask) for mask in masks),
+    }
+
+
+def cache_report(cache: AssetCache, root: str) -> Dict[str, Dict[str, int]]:
+    # surface bytes per asset directory. atlas frames are charged their area of the sheet, the sheet itself
+    # only keeps what no cached frame accounts for
+    items = cache.items()
+    charged: Dict[int, int] = {}
+    for _, surface in items:
+        parent = surface.get_parent()
+        if parent is not None:
+            charged[id(parent)] = charged.get(id(parent), 0) + frame_bytes(surface)
+
+    directories: Dict[str, Dict[str, int]] = {}
+    for (path, size, flip), surface in items:
+        directory = os.path.relpath(os.path.dirname(path), root)
+        entry = directories.setdefault(directory, {'frames': 0, 'bytes': 0, 'mirrored_frames': 0, 'mirrored_bytes': 0})
+        if flip:
+            entry['mirrored_frames'] += 1
+            entry['mirrored_bytes'] += frame_bytes(surface)
+        else:
+            entry['frames'] += 1
+            entry['bytes'] += max(frame_bytes(surface) - charged.get(id(surface), 0), 0)
+    return directories
+
+
+def memory_report(game, cache: AssetCache = asset_cache) -> dict:
+    animations = {
+        'character': {state.name: animation_report(animation)
+                      for state, animation in game.char.animation_by_state.items()},
+        'enemy': {state.name: animation_report(game.enemies.type.animations[state.value]) for state in EnemyState},
+        'king': {'idle': animation_report(game.king.animation_by_state[0])},
+        'keir': {'idle': animation_report(game.keir.animation_by_state[0])},
+    }
+    backgrounds = {scene.name: surface_bytes(scene.background) for scene in game.scenes.scenes if scene.resident}
+    return {
+        'compact': cache.compact,
+        'cache_bytes': cache.used_bytes,
+        'directories': cache_report(cache, os.path.normpath(ASSET_DIRECTORY)),
+        'animations': animations,
+        'backgrounds': backgrounds,
+        'rotation_cache_bytes': rotation_cache.used_bytes,
+    }
+
+
+def format_report(report: dict) -> str:
+    lines = ['sprite cache {:.2f} MB{}'.format(report['cache_bytes'] / MB, ' (compact)' if report['compact'] else '')]
+    lines.append('{:<24} {:>7} {:>10} {:>9} {:>10}'.format('directory', 'frames', 'MB', 'mirrored', 'MB'))
+    for directory, entry in sorted(report['directories'].items()):
+        lines.append('{:<24} {:>7} {:>10.2f} {:>9} {:>10.2f}'.format(
+            directory, entry['frames'], entry['bytes'] / MB, entry['mirrored_frames'], entry['mirrored_bytes'] / MB))
+
+    lines.append('')
+    lines.append('{:<24} {:>7} {:>10} {:>9} {:>10} {:>8}'.format('animation', 'frames', 'MB', 'mirrored', 'MB', 'masks KB'))
+    for actor, states in report['animations'].items():
+        for state, entry in states.items():
+            lines.append('{:<24} {:>7} {:>10.2f} {:>9} {:>10.2f} {:>8.0f}'.format(
+                actor + '/' + state, entry['frames'], entry['bytes'] / MB, entry['mirrored_loaded'],
+                entry['mirrored_bytes'] / MB, entry['mask_bytes'] / 1024))
+
+    lines.append('')
+    for name, size in report['backgrounds'].items():
+        lines.append('background {:<30} {:>8.2f} MB'.format(name, size / MB))
+    lines.append('rotation cache {:.2f} MB'.format(report['rotation_cache_bytes'] / MB))
+    return '\n'.join(lines)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="report how much memory the game's sprites take")
+    parser.add_argument('--compact', action='store_true', help="store frames trimmed to their opaque bounding box")
+    parser.add_argument('--mirrored', action='store_true', help="build every mirrored frame before reporting")
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    asset_cache.compact = args.compact
+    game = Game(headless=True)
+    if args.mirrored:
+        for animation in list(game.char.animation_by_state.values()) + game.enemies.type.animations:
+            animation.prewarm()
+
+    report = memory_report(game)
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+    game.close()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -1,6 +1,7 @@
 from PyQt5 import uic
 from PyQt5.QtWidgets import QApplication, QMainWindow
-import logging
+from game_witcher.game import main as run_game, prewarm_assets
+import threading
 import sys
 import os
 
@@ -8,13 +9,18 @@ import os
 class MyWidget(QMainWindow):
     def __init__(self):
         super().__init__()
-        uic.loadUi('main_menu.ui', self)
+        uic.loadUi(os.path.join(os.path.dirname(__file__), 'main_menu.ui'), self)
         self.new_game.clicked.connect(self.start_game)
         self.setWindowTitle('The Witcher 4: Flat World')
+        # sprites are decoded and scaled while the menu is open, the game converts them once its window exists
+        self.prewarm = threading.Thread(target=prewarm_assets, name='asset-prewarm', daemon=True)
+        self.prewarm.start()
 
     def start_game(self):
-        os.system('python game.py')
-        sys.exit(app.exec_())
+        self.hide()
+        self.prewarm.join()
+        run_game([])
+        QApplication.quit()
 
 
 
@@ -23,4 +29,4 @@ if __name__ == '__main__':
     app = QApplication(sys.argv)
     ex = MyWidget()
     ex.show()
-    sys.exit(app.exec_())
\ No newline at end of file
+    sys.exit(app.exec_())
@@ -0,0 +1,128 @@
+import csv
+import json
+import numpy as np
+import pygame
+
+from time import perf_counter
+from typing import Dict, Optional, Sequence
+
+
+PHASES = ('events', 'reload', 'input', 'animation', 'enemies', 'collision', 'scene', 'state', 'draw', 'flush', 'wait')
+PERCENTILES = (50, 95, 99)
+OVERLAY_POSITION = (8, 8)
+OVERLAY_REFRESH = 15
+
+
+def _noop(*args):
+    pass
+
+
+class FrameProfiler:
+    # per-phase seconds for the last `capacity` frames, the last column is the whole frame
+    def __init__(self, phases: Sequence[str] = PHASES, capacity: int = 600, enabled: bool = False):
+        self.phases = tuple(phases)
+        self.index = {phase: i for i, phase in enumerate(self.phases)}
+        self.samples = np.zeros((capacity, len(self.phases) + 1))
+        self.frames = 0
+        self.show_overlay = False
+        self._row: Optional[np.ndarray] = None
+        self._frame_start = 0.0
+        self._last = 0.0
+        self._overlay: Optional[pygame.Surface] = None
+        self.enabled = False
+        self.enable(enabled)
+
+    def enable(self, enabled: bool = True):
+        # when disabled the hooks are rebound to a no-op, so instrumented code pays one call
+        self.enabled = enabled
+        if enabled:
+            self.begin_frame = self._begin_frame
+            self.mark = self._mark
+            self.end_frame = self._end_frame
+        else:
+            self.begin_frame = self.mark = self.end_frame = _noop
+            self._row = None
+
+    def toggle_overlay(self):
+        self.show_overlay = not self.show_overlay
+        if self.show_overlay and not self.enabled:
+            self.enable()
+        self._overlay = None
+
+    def _begin_frame(self):
+        self._row = self.samples[self.frames % len(self.samples)]
+        self._row[:] = 0.0
+        self._frame_start = self._last = perf_counter()
+
+    def _mark(self, phase: str):
+        # everything since the previous mark is charged to `phase`
+        now = perf_counter()
+        if self._row is not None:
+            self._row[self.index[phase]] += now - self._last
+        self._last = now
+
+    def _end_frame(self):
+        if self._row is None:
+            return
+        self._row[-1] = perf_counter() - self._frame_start
+        self._row = None
+        self.frames += 1
+
+    def recorded(self) -> np.ndarray:
+        return self.samples[:min(self.frames, len(self.samples))]
+
+    def latest(self, count: int) -> np.ndarray:
+        count = min(count, self.frames, len(self.samples))
+        return self.samples[np.arange(self.frames - count, self.frames) % len(self.samples)]
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        samples = self.recorded()
+        stats = {}
+        if not len(samples):
+            return stats
+        for i, name in enumerate(self.phases + ('frame',)):
+            column = samples[:, i] * 1000
+            stats[name] = {'mean_ms': float(column.mean())}
+            for p, value in zip(PERCENTILES, np.percentile(column, PERCENTILES)):
+                stats[name]['p{}_ms'.format(p)] = float(value)
+        stats['frame']['fps'] = float(1000 / stats['frame']['mean_ms']) if stats['frame']['mean_ms'] else 0.0
+        return stats
+
+    def export(self, path: str):
+        stats = self.stats()
+        if path.endswith('.csv'):
+            with open(path, 'w', newline='') as file:
+                writer = csv.writer(file)
+                writer.writerow(['phase', 'mean_ms'] + ['p{}_ms'.format(p) for p in PERCENTILES])
+                for name, values in stats.items():
+                    writer.writerow([name, values['mean_ms']] + [values['p{}_ms'.format(p)] for p in PERCENTILES])
+        else:
+            with open(path, 'w') as file:
+                json.dump({'frames': self.frames, 'window': len(self.recorded()), 'phases': stats}, file, indent=2)
+
+    def overlay(self, text_renderer, size: int = 16, color=(255, 255, 0)) -> Optional[pygame.Surface]:
+        # rebuilt a few times per second, in between the same surface is returned so it is not repainted
+        if not self.show_overlay:
+            return None
+        if self._overlay is not None and self.frames % OVERLAY_REFRESH:
+            return self._overlay
+
+        samples = self.latest(OVERLAY_REFRESH * 4)
+        if not len(samples):
+            return None
+        means = samples.mean(axis=0) * 1000
+        lines = ['{:.0f} fps  {:.2f} ms'.format(1000 / means[-1] if means[-1] else 0.0, means[-1])]
+        lines += ['{:<9} {:6.2f} ms'.format(phase, means[i]) for i, phase in enumerate(self.phases)]
+
+        # rendered straight from the font so the changing numbers stay out of the text cache
+        font = text_renderer.font(size)
+        rendered = [font.render(line, True, color) for line in lines]
+        surface = pygame.Surface((max(line.get_width() for line in rendered) + 8,
+                                  sum(line.get_height() for line in rendered) + 8), pygame.SRCALPHA)
+        surface.fill((0, 0, 0, 160))
+        y = 4
+        for line in rendered:
+            surface.blit(line, (4, y))
+            y += line.get_height()
+        self._overlay = surface
+        return surface
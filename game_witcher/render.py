@@ -0,0 +1,212 @@
+import pygame
+
+from collections import deque
+from operator import itemgetter
+from typing import Dict, List, Tuple, Optional, Sequence
+from weakref import WeakKeyDictionary
+from game_witcher.utils import surface_bytes
+
+
+# draw order, lower layers are drawn first
+LAYER_ACTORS = 10
+LAYER_DIALOGUE = 15
+LAYER_PLAYER = 20
+LAYER_TEXT = 30
+LAYER_OVERLAY = 40
+
+# internal render resolution tiers, as a fraction of the window size. only whole-number divisions of the window,
+# so every low resolution pixel covers an exact block of window pixels and dirty rects map across without seams
+RENDER_SCALES = (1.0, 0.5)
+
+DrawItem = Tuple[pygame.Surface, Tuple[int, int], int]
+
+
+def off_screen(x, y, width, height, screen_width, screen_height) -> bool:
+    return x >= screen_width or y >= screen_height or x + width <= 0 or y + height <= 0
+
+
+def merge_rects(rects: List[pygame.Rect]) -> List[pygame.Rect]:
+    merged: List[pygame.Rect] = []
+    for rect in rects:
+        rect = rect.copy()
+        i = 0
+        while i < len(merged):
+            if merged[i].colliderect(rect):
+                rect.union_ip(merged.pop(i))
+                i = 0
+            else:
+                i += 1
+        merged.append(rect)
+    return merged
+
+
+class DirtyRenderer:
+    def __init__(self, screen: pygame.Surface):
+        self.screen = screen
+        self._background: Optional[pygame.Surface] = None
+        self._items: List[DrawItem] = []
+        self._previous: List[DrawItem] = []
+        self._full = True
+        self.dirty_rects: List[pygame.Rect] = []
+        self.culled = 0
+
+    def invalidate(self):
+        self._full = True
+
+    def begin(self, background: pygame.Surface):
+        if background is not self._background:
+            self._background = background
+            self._full = True
+        self._items = []
+
+    def blit(self, surface: pygame.Surface, position, layer: int = LAYER_ACTORS):
+        # queued until flush, anything entirely off screen (e.g. actors parked at -1000) is dropped here
+        x, y = int(position[0]), int(position[1])
+        if off_screen(x, y, *surface.get_size(), *self.screen.get_size()):
+            self.culled += 1
+            return
+        self._items.append((surface, (x, y), layer))
+
+    def flush(self) -> List[pygame.Rect]:
+        rects = self.draw()
+        if rects:
+            pygame.display.update(rects)
+        return rects
+
+    def draw(self) -> List[pygame.Rect]:
+        # composes the queue onto self.screen and returns the rects that changed
+        screen = self.screen
+        screen_rect = screen.get_rect()
+        # stable, so items on one layer keep the order they were queued in
+        self._items.sort(key=itemgetter(2))
+
+        if self._full:
+            screen.blit(self._background, (0, 0))
+            screen.blits([(surface, position) for surface, position, _ in self._items], doreturn=False)
+            self.dirty_rects = [screen_rect]
+        else:
+            # anything that appeared, disappeared, moved, changed frame or layer since the last flush
+            changed = set(self._previous).symmetric_difference(self._items)
+            rects = [surface.get_rect(topleft=position).clip(screen_rect) for surface, position, _ in changed]
+            self.dirty_rects = merge_rects([rect for rect in rects if rect.width and rect.height])
+
+            for rect in self.dirty_rects:
+                screen.set_clip(rect)
+                screen.blit(self._background, rect, rect)
+                screen.blits([(surface, position) for surface, position, _ in self._items
+                              if rect.colliderect(surface.get_rect(topleft=position))], doreturn=False)
+            screen.set_clip(None)
+
+        self._previous = self._items
+        self._items = []
+        self._full = False
+        return self.dirty_rects
+
+
+class ScaledRenderer(DirtyRenderer):
+    # below scale 1.0 the frame is composed on a smaller offscreen surface from scaled copies of the sprites,
+    # and only the rects that changed are stretched to the window and updated. scaled copies are kept per tier,
+    # so switching back and forth between tiers only scales each sprite once and never decodes anything again
+    def __init__(self, window: pygame.Surface, scale: float = 1.0):
+        super().__init__(window)
+        self.window = window
+        self.scale = 1.0
+        self.factor = 1
+        self._scaled: 'Dict[int, WeakKeyDictionary[pygame.Surface, pygame.Surface]]' = {}
+        self.set_scale(scale)
+
+    def set_scale(self, scale: float):
+        # rounded to the nearest whole-number division of the window
+        factor = max(1, round(1 / max(scale, 0.01)))
+        if factor == self.factor:
+            return
+        self.factor = factor
+        self.scale = 1 / factor
+        if factor == 1:
+            self.screen = self.window
+        else:
+            width, height = self.window.get_size()
+            self.screen = pygame.Surface((width // factor, height // factor), 0, self.window)
+        self._background = None
+        self.invalidate()
+
+    @property
+    def used_bytes(self) -> int:
+        return sum(surface_bytes(surface) for tier in self._scaled.values() for surface in tier.values())
+
+    def scaled(self, surface: pygame.Surface) -> pygame.Surface:
+        tier = self._scaled.setdefault(self.factor, WeakKeyDictionary())
+        found = tier.get(surface)
+        if found is None:
+            width, height = surface.get_size()
+            size = max(1, width // self.factor), max(1, height // self.factor)
+            try:
+                found = pygame.transform.smoothscale(surface, size)
+            except ValueError:
+                # smoothscale only takes 24 and 32 bit surfaces
+                found = pygame.transform.scale(surface, size)
+            tier[surface] = found
+        return found
+
+    def begin(self, background: pygame.Surface):
+        super().begin(background if self.factor == 1 else self.scaled(background))
+
+    def blit(self, surface: pygame.Surface, position, layer: int = LAYER_ACTORS):
+        if self.factor == 1:
+            super().blit(surface, position, layer)
+            return
+        # culled in window coordinates first, so nothing off screen gets a scaled copy
+        x, y = position
+        if off_screen(x, y, *surface.get_size(), *self.window.get_size()):
+            self.culled += 1
+            return
+        self._items.append((self.scaled(surface), (int(x // self.factor), int(y // self.factor)), layer))
+
+    def flush(self) -> List[pygame.Rect]:
+        if self.factor == 1:
+            return super().flush()
+        factor = self.factor
+        rects = []
+        for rect in self.draw():
+            target = pygame.Rect(rect.x * factor, rect.y * factor, rect.width * factor, rect.height * factor)
+            pygame.transform.scale(self.screen.subsurface(rect), target.size, self.window.subsurface(target))
+            rects.append(target)
+        if rects:
+            pygame.display.update(rects)
+        self.dirty_rects = rects
+        return rects
+
+
+class ResolutionGovernor:
+    # picks a tier from the average of recent render times: one step down when rendering runs over budget,
+    # one step up once the larger tier is expected to fit comfortably as well
+    def __init__(self, budget_ms: float, tiers: Sequence[float] = RENDER_SCALES, window: int = 30,
+                 high: float = 0.9, low: float = 0.75):
+        self.budget_ms = budget_ms
+        self.tiers = tuple(tiers)
+        self.high = high
+        self.low = low
+        self.tier = 0
+        self._samples = deque(maxlen=window)
+
+    @property
+    def scale(self) -> float:
+        return self.tiers[self.tier]
+
+    def record(self, render_ms: float) -> float:
+        samples = self._samples
+        samples.append(render_ms)
+        if len(samples) < samples.maxlen:
+            return self.scale
+
+        average = sum(samples) / len(samples)
+        if average > self.budget_ms * self.high and self.tier < len(self.tiers) - 1:
+            self.tier += 1
+            samples.clear()
+        elif self.tier > 0:
+            # drawing cost grows with the pixel count
+            expected = average * (self.tiers[self.tier - 1] / self.scale) ** 2
+            if expected < self.budget_ms * self.low:
+                self.tier -= 1
+                samples.clear()
+        return self.scale
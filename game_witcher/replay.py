@@ -0,0 +1,52 @@
+import argparse
+import sys
+
+from game_witcher.animation import SIMULATION_RATE
+from game_witcher.game import Game, Inputs
+from game_witcher.input_log import InputLog
+from game_witcher.telemetry import get_logger, setup_logging
+
+
+logger = get_logger('game')
+
+
+def replay(game: Game, log: InputLog, realtime: bool = False):
+    inputs = (Inputs.from_bits(bits) for bits in log)
+    if realtime:
+        # paced by the normal fixed-timestep loop, so it looks and times exactly like the recorded session
+        game.run(inputs=inputs)
+        return game.ticks
+
+    for tick_inputs in inputs:
+        game.profiler.begin_frame()
+        running = game.step(tick_inputs)
+        game.render()
+        game.profiler.end_frame()
+        if not running:
+            break
+    game.close()
+    return game.ticks
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="play back an input log recorded with game.py --record")
+    parser.add_argument('log', help="input log to play back")
+    parser.add_argument('--realtime', action='store_true', help="play at the recorded speed instead of flat out")
+    parser.add_argument('--headless', action='store_true', help="simulate without a window")
+    parser.add_argument('--fps', type=int, default=56, help="render frame rate cap for --realtime")
+    parser.add_argument('--profile', metavar='PATH', default=None,
+                        help="record per-phase frame timings and write p50/p95/p99 to a .json or .csv file on exit")
+    args = parser.parse_args(argv)
+
+    log = InputLog.open(args.log)
+    if log.rate != SIMULATION_RATE:
+        parser.error("{} was recorded at {} ticks/s, the game runs at {}".format(args.log, log.rate, SIMULATION_RATE))
+
+    setup_logging()
+    game = Game(headless=args.headless, fps=args.fps, profile=args.profile, enemies=log.enemies)
+    ticks = replay(game, log, args.realtime)
+    logger.info("replayed %d of %d ticks", ticks, len(log))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
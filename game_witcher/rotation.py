@@ -0,0 +1,65 @@
+import pygame
+
+from collections import OrderedDict
+from typing import Tuple
+from game_witcher.utils import surface_bytes
+
+
+ANGLE_STEP = 1.0
+
+Offset = Tuple[int, int]
+
+
+class RotationCache:
+    # rotated copies of frames at angles rounded to `step` degrees, built on first use and evicted
+    # least recently used first once they take more than max_bytes
+    def __init__(self, step: float = ANGLE_STEP, max_bytes: int = 32 * 1024 * 1024):
+        self.step = step
+        self.max_bytes = max_bytes
+        self._rotated: 'OrderedDict[Tuple[pygame.Surface, int], Tuple[pygame.Surface, Offset]]' = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def used_bytes(self):
+        return self._bytes
+
+    def __len__(self):
+        return len(self._rotated)
+
+    def rotated(self, surface: pygame.Surface, angle: float) -> Tuple[pygame.Surface, Offset]:
+        # the offset keeps the rotated frame centered on where the upright one would be drawn
+        quantized = round(angle / self.step)
+        if quantized == 0:
+            return surface, (0, 0)
+
+        key = (surface, quantized)
+        found = self._rotated.get(key)
+        if found is not None:
+            self._rotated.move_to_end(key)
+            self.hits += 1
+            return found
+
+        self.misses += 1
+        rotated = pygame.transform.rotate(surface, quantized * self.step)
+        found = rotated, ((surface.get_width() - rotated.get_width()) // 2,
+                          (surface.get_height() - rotated.get_height()) // 2)
+        self._rotated[key] = found
+        self._bytes += surface_bytes(rotated)
+        while self._bytes > self.max_bytes and len(self._rotated) > 1:
+            _, (evicted, _) = self._rotated.popitem(last=False)
+            self._bytes -= surface_bytes(evicted)
+        return found
+
+    def discard(self, surface: pygame.Surface):
+        for key in [key for key in self._rotated if key[0] is surface]:
+            rotated, _ = self._rotated.pop(key)
+            self._bytes -= surface_bytes(rotated)
+
+    def clear(self):
+        self._rotated.clear()
+        self._bytes = 0
+
+
+rotation_cache = RotationCache()
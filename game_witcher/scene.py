@@ -0,0 +1,143 @@
+import pygame
+import os
+
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Tuple, Optional, List, Dict, Sequence
+from game_witcher.disk_cache import SpriteDiskCache
+
+
+SCREEN_SIZE = (1012, 576)
+
+
+class Scene:
+    def __init__(self, name: str, background_path: str, actors: Sequence[str] = (),
+                 neighbors: Optional[Sequence[int]] = None, size: Tuple[int, int] = SCREEN_SIZE,
+                 music: Optional[str] = None):
+        self.name = name
+        self.background_path = background_path
+        self.music = music
+        self.actors = tuple(actors)
+        self.neighbors = None if neighbors is None else tuple(neighbors)
+        self.size = size
+        self.background: Optional[pygame.Surface] = None
+
+    @property
+    def resident(self):
+        return self.background is not None
+
+
+def decode_background(path: str, size: Tuple[int, int], disk_cache: Optional[SpriteDiskCache]) -> pygame.Surface:
+    if disk_cache is not None:
+        surface = disk_cache.get(path, size, lambda raw: raw)
+        if surface is not None:
+            return surface
+
+    surface = pygame.image.load(path)
+    if surface.get_size() != size:
+        surface = pygame.transform.scale(surface, size)
+    if disk_cache is not None:
+        disk_cache.put(path, surface, size)
+    return surface
+
+
+class SceneManager:
+    def __init__(self, scenes: List[Scene], radius: int = 1, disk_cache: Optional[SpriteDiskCache] = None):
+        self.scenes = scenes
+        self.radius = radius
+        self.disk_cache = disk_cache
+        self.index: Optional[int] = None
+        self.loads = 0
+        self._pending: Dict[int, Future] = {}
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix='scene-preload')
+
+        for i, scene in enumerate(scenes):
+            if scene.neighbors is None:
+                scene.neighbors = tuple(j for j in (i - 1, i + 1) if 0 <= j < len(scenes))
+
+    def __getitem__(self, index: int) -> Scene:
+        return self.scenes[index]
+
+    def __len__(self):
+        return len(self.scenes)
+
+    @property
+    def current(self) -> Scene:
+        return self.scenes[self.index]
+
+    def nearby(self, index: int) -> set:
+        # breadth-first over the neighbor graph up to radius steps away
+        found = {index}
+        frontier = [index]
+        for _ in range(self.radius):
+            frontier = [j for i in frontier for j in self.scenes[i].neighbors if j not in found]
+            found.update(frontier)
+        return found
+
+    def go(self, index: int) -> Scene:
+        if index == self.index:
+            self.poll()
+            return self.current
+
+        self.index = index
+        self._make_resident(index)
+
+        keep = self.nearby(index)
+        for i, scene in enumerate(self.scenes):
+            if i not in keep:
+                self._unload(i)
+            elif not scene.resident and i not in self._pending:
+                self._pending[i] = self._executor.submit(
+                    decode_background, scene.background_path, scene.size, self.disk_cache)
+
+        self.poll()
+        return self.current
+
+    def poll(self):
+        for i, future in list(self._pending.items()):
+            if future.done():
+                self._finish(i)
+
+    def _make_resident(self, index: int):
+        scene = self.scenes[index]
+        if scene.resident:
+            return
+        if index in self._pending:
+            self._finish(index)
+        else:
+            self._install(index, decode_background(scene.background_path, scene.size, self.disk_cache))
+
+    def _finish(self, index: int):
+        self._install(index, self._pending.pop(index).result())
+
+    def _install(self, index: int, surface: pygame.Surface):
+        # display-format conversion has to happen on the main thread
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert_alpha() if surface.get_flags() & pygame.SRCALPHA else surface.convert()
+        self.scenes[index].background = surface
+        self.loads += 1
+
+    def reload(self, path: str) -> List[Scene]:
+        # scenes whose edited background was loaded or being loaded get it decoded again,
+        # the others pick the new file up from disk when they are next visited
+        path = os.path.normpath(os.path.abspath(path))
+        reloaded = []
+        for i, scene in enumerate(self.scenes):
+            if os.path.normpath(os.path.abspath(scene.background_path)) != path:
+                continue
+            future = self._pending.pop(i, None)
+            if future is not None:
+                future.cancel()
+            if scene.resident or future is not None:
+                self._install(i, decode_background(scene.background_path, scene.size, self.disk_cache))
+                reloaded.append(scene)
+        return reloaded
+
+    def _unload(self, index: int):
+        future = self._pending.pop(index, None)
+        if future is not None:
+            future.cancel()
+        self.scenes[index].background = None
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._pending.clear()
@@ -0,0 +1,138 @@
+import atexit
+import logging
+import sys
+import time
+
+from collections import OrderedDict
+from logging.handlers import QueueHandler, QueueListener
+from queue import Empty, SimpleQueue
+from typing import Dict, Iterable, Optional
+
+
+# every logger in the game is game_witcher.<category>, so each category gets its own level
+CATEGORIES = ('game', 'input', 'events', 'combat', 'world', 'dialogue')
+FORMAT = '%(relativeCreated)8.0f %(levelname)-7s %(name)s: %(message)s'
+SUMMARY_INTERVAL = 5.0
+# distinct messages whose repeats are tracked, the least recently seen is summarized and forgotten first
+MAX_TRACKED = 256
+
+_listener: Optional['RepeatListener'] = None
+
+
+def get_logger(category: str) -> logging.Logger:
+    return logging.getLogger('game_witcher.' + category)
+
+
+class RepeatListener(QueueListener):
+    # runs on the listener thread. the first occurrence of a message is written, repeats within `interval`
+    # are only counted and summarized once the interval has passed. messages are compared by format string
+    # and arguments, so nothing is formatted to spot a repeat, and warnings and errors are never held back
+    def __init__(self, queue, *handlers, interval: float = SUMMARY_INTERVAL, tracked: int = MAX_TRACKED):
+        super().__init__(queue, *handlers, respect_handler_level=True)
+        self.interval = interval
+        self.tracked = tracked
+        # key -> [first seen, last seen, repeats, first record], least recently seen first
+        self._seen: OrderedDict = OrderedDict()
+
+    def dequeue(self, block: bool) -> logging.LogRecord:
+        # wakes up at least once per interval, so a burst that stopped is still summarized
+        while True:
+            self.summarize(time.time())
+            try:
+                return self.queue.get(block, self.interval)
+            except Empty:
+                pass
+
+    def handle(self, record: logging.LogRecord):
+        if record.levelno >= logging.WARNING or not self._repeated(record):
+            super().handle(record)
+
+    def _repeated(self, record: logging.LogRecord) -> bool:
+        key = (record.name, record.levelno, record.msg, record.args)
+        try:
+            hash(key)
+        except TypeError:
+            key = key[:3] + (repr(record.args),)
+
+        entry = self._seen.get(key)
+        if entry is not None:
+            self._seen.move_to_end(key)
+            if record.created - entry[0] < self.interval:
+                entry[1] = record.created
+                entry[2] += 1
+                return True
+            self._write_summary(entry)
+
+        self._seen[key] = [record.created, record.created, 0, record]
+        if len(self._seen) > self.tracked:
+            self._write_summary(self._seen.popitem(last=False)[1])
+        return False
+
+    def summarize(self, now: float):
+        for entry in self._seen.values():
+            if entry[2] and now - entry[0] >= self.interval:
+                self._write_summary(entry)
+
+    def _write_summary(self, entry: list):
+        first, last, count, record = entry
+        if not count:
+            return
+        entry[2] = 0
+        summary = logging.getLogger(record.name).makeRecord(
+            record.name, record.levelno, record.pathname, record.lineno, '%s (+%d repeats in %.1fs)',
+            (record.getMessage(), count, last - first), None)
+        super().handle(summary)
+
+    def stop(self):
+        super().stop()
+        self.summarize(float('inf'))
+
+
+class DeferredQueueHandler(QueueHandler):
+    # the queue never leaves the process, so formatting is left to the listener thread
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def parse_levels(specs: Iterable[str]) -> Dict[str, int]:
+    levels = {}
+    for spec in specs:
+        for item in spec.split(','):
+            category, _, level = item.partition('=')
+            if category not in CATEGORIES or not level:
+                raise ValueError("expected CATEGORY=LEVEL with a category from {}, got {!r}".format(CATEGORIES, item))
+            levels[category] = logging.getLevelName(level.upper())
+            if not isinstance(levels[category], int):
+                raise ValueError("unknown log level {!r}".format(level))
+    return levels
+
+
+def setup_logging(level: int = logging.INFO, categories: Optional[Dict[str, int]] = None,
+                  interval: float = SUMMARY_INTERVAL, stream=None) -> QueueListener:
+    global _listener
+    shutdown_logging()
+
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(logging.Formatter(FORMAT))
+    queue = SimpleQueue()
+    _listener = RepeatListener(queue, handler, interval=interval)
+
+    root = logging.getLogger()
+    root.handlers[:] = [DeferredQueueHandler(queue)]
+    root.setLevel(level)
+    for category in CATEGORIES:
+        get_logger(category).setLevel((categories or {}).get(category, logging.NOTSET))
+
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return _listener
+
+
+def shutdown_logging():
+    global _listener
+    if _listener is None:
+        return
+
+    # stopping drains the queue and writes the summaries still pending
+    _listener.stop()
+    _listener = None
@@ -0,0 +1,68 @@
+import pygame
+
+from collections import OrderedDict
+from typing import Tuple, Dict, Optional
+from game_witcher.frames import expand
+from game_witcher.utils import AssetCache, asset_cache
+
+
+Color = Tuple[int, int, int]
+
+PANEL_SIZE = (900, 300)
+PANEL_POSITION = (56, -50)
+SPEAKER_POSITION = (150, 35)
+LINE_POSITION = (150, 85)
+
+
+class TextRenderer:
+    def __init__(self, face: str, panel_path: Optional[str] = None, cache: Optional[AssetCache] = None,
+                 max_lines: int = 256, max_panels: int = 16):
+        self.face = face
+        self.panel_path = panel_path
+        self.cache = asset_cache if cache is None else cache
+        self.max_lines = max_lines
+        self.max_panels = max_panels
+        self._fonts: Dict[Tuple[str, int], pygame.font.Font] = {}
+        self._lines: 'OrderedDict[Tuple[str, int, str, Color], pygame.Surface]' = OrderedDict()
+        self._panels: 'OrderedDict[Tuple[str, str, int, Color], pygame.Surface]' = OrderedDict()
+
+    def font(self, size: int, face: Optional[str] = None) -> pygame.font.Font:
+        key = (self.face if face is None else face, size)
+        font = self._fonts.get(key)
+        if font is None:
+            font = self._fonts[key] = pygame.font.Font(*key)
+        return font
+
+    def render(self, text: str, color: Color, size: int, face: Optional[str] = None) -> pygame.Surface:
+        key = (self.face if face is None else face, size, text, tuple(color))
+        surface = self._lines.get(key)
+        if surface is not None:
+            self._lines.move_to_end(key)
+            return surface
+
+        surface = self._lines[key] = self.font(size, key[0]).render(text, False, color)
+        if len(self._lines) > self.max_lines:
+            self._lines.popitem(last=False)
+        return surface
+
+    def dialogue_panel(self, speaker: str, line: str, size: int = 20, color: Color = (0, 0, 0)) -> pygame.Surface:
+        key = (speaker, line, size, tuple(color))
+        panel = self._panels.get(key)
+        if panel is not None:
+            self._panels.move_to_end(key)
+            return panel
+
+        panel = expand(self.cache.load(self.panel_path, PANEL_SIZE))
+        panel.blit(self.render(line, color, size),
+                   (LINE_POSITION[0] - PANEL_POSITION[0], LINE_POSITION[1] - PANEL_POSITION[1]))
+        panel.blit(self.render(speaker, color, size),
+                   (SPEAKER_POSITION[0] - PANEL_POSITION[0], SPEAKER_POSITION[1] - PANEL_POSITION[1]))
+
+        self._panels[key] = panel
+        if len(self._panels) > self.max_panels:
+            self._panels.popitem(last=False)
+        return panel
+
+    def clear(self):
+        self._lines.clear()
+        self._panels.clear()
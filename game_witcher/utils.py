@@ -1,16 +1,319 @@
-
 import pygame
+import os
 
-from typing import Tuple, Optional
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple, Optional, List, Sequence, Dict, Callable, Set
+from game_witcher.atlas import Atlas, ATLAS_DIRECTORY, find_atlas
+from game_witcher.disk_cache import SpriteDiskCache
+from game_witcher.frames import trim, carry_trim, flip_frame
 
 
-def pygame_load_image(start_value: int, count_frames: int, pattern_name: str, size_image: Tuple[int, int],
-                      max_number_len: Optional[int] = None ):
+AssetKey = Tuple[str, Optional[Tuple[int, int]], bool]
+
+
+def surface_bytes(surface: pygame.Surface) -> int:
+    # atlas frames share their pixels with the atlas image, which is accounted for on its own
+    if surface.get_parent() is not None:
+        return 0
+    return surface.get_pitch() * surface.get_height()
+
+
+# below this many frames a batch decodes faster on the calling thread than handed out to the pool
+MIN_PARALLEL_FRAMES = 4
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_workers = 0
+
+
+def _get_executor(workers: int) -> ThreadPoolExecutor:
+    global _executor, _executor_workers
+
+    # threads, since pygame releases the GIL while it decodes and scales, and they cost nothing to start
+    if _executor is None or _executor_workers != workers:
+        if _executor is not None:
+            _executor.shutdown()
+        _executor = ThreadPoolExecutor(workers, thread_name_prefix='sprite-decode')
+        _executor_workers = workers
+    return _executor
+
+
+def shutdown_workers():
+    global _executor
+
+    if _executor is not None:
+        _executor.shutdown()
+        _executor = None
+
+
+def _read(path: str, size: Optional[Tuple[int, int]]) -> Tuple[pygame.Surface, bool]:
+    surface = pygame.image.load(path)
+    if size is not None and surface.get_size() != size:
+        return pygame.transform.scale(surface, size), True
+    return surface, False
+
+
+class AssetCache:
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, workers: int = 0,
+                 atlas_directory: Optional[str] = ATLAS_DIRECTORY, disk_cache: Optional[SpriteDiskCache] = None,
+                 compact: bool = False):
+        self.max_bytes = max_bytes
+        self.workers = workers
+        # compact keeps sized frames trimmed to their opaque bounding box, see game_witcher.frames
+        self.compact = compact
+        self.atlas_directory = atlas_directory
+        self.disk_cache = disk_cache
+        self._atlases: Dict[str, Optional[Atlas]] = {}
+        self._surfaces: 'OrderedDict[AssetKey, pygame.Surface]' = OrderedDict()
+        # entries stored before a display existed, they still have the file's pixel format
+        self._unconverted: Set[AssetKey] = set()
+        self._bytes = 0
+        self.disk_reads = 0
+        self.scales = 0
+        self.flips = 0
+        self.hits = 0
+
+    @property
+    def used_bytes(self):
+        return self._bytes
+
+    def __len__(self):
+        return len(self._surfaces)
+
+    def __contains__(self, key: AssetKey):
+        return self._make_key(*key) in self._surfaces
+
+    def items(self):
+        return list(self._surfaces.items())
+
+    @property
+    def _use_atlas(self):
+        # atlas frames share one sheet, trimming them would copy every frame and keep the sheet as well
+        return self.atlas_directory is not None and not self.compact
+
+    @staticmethod
+    def _make_key(path: str, size: Optional[Tuple[int, int]] = None, flip: bool = False) -> AssetKey:
+        return os.path.normpath(os.path.abspath(path)), tuple(size) if size is not None else None, bool(flip)
+
+    @staticmethod
+    def _convert(surface: pygame.Surface) -> pygame.Surface:
+        if pygame.display.get_surface() is None:
+            return surface
+        if surface.get_flags() & pygame.SRCALPHA or surface.get_alpha() is not None:
+            return surface.convert_alpha()
+        return surface.convert()
+
+    def load(self, path: str, size: Optional[Tuple[int, int]] = None, flip: bool = False) -> pygame.Surface:
+        key = self._make_key(path, size, flip)
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self._surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        if flip:
+            surface = flip_frame(self.load(path, size))
+            self.flips += 1
+        elif size is not None and self._use_atlas and not self._load_from_atlas([path], size):
+            return self._surfaces[key]
+        else:
+            surface = self._load_from_disk_cache(key[0], key[1])
+            if surface is None:
+                surface = self._decode(key[0], key[1])
+
+        return self._store(key, surface)
+
+    def _decode(self, path: str, size: Optional[Tuple[int, int]]) -> pygame.Surface:
+        return self._finish_decode(path, size, *_read(path, size))
+
+    def _finish_decode(self, path: str, size: Optional[Tuple[int, int]], surface: pygame.Surface,
+                       scaled: bool) -> pygame.Surface:
+        self.disk_reads += 1
+        self.scales += scaled
+        if self.disk_cache is not None:
+            self.disk_cache.put(path, surface, size)
+        return self._convert(surface)
+
+    def _load_from_disk_cache(self, path: str, size: Optional[Tuple[int, int]]) -> Optional[pygame.Surface]:
+        if self.disk_cache is None:
+            return None
+        return self.disk_cache.get(path, size, self._convert)
+
+    def load_many(self, paths: Sequence[str], size: Optional[Tuple[int, int]] = None,
+                  flip: bool = False) -> List[pygame.Surface]:
+        if flip:
+            self.load_many(paths, size)
+        elif size is not None:
+            missing = list(dict.fromkeys(key[0] for key in (self._make_key(path, size) for path in paths)
+                                         if key not in self._surfaces))
+            if missing and self._use_atlas:
+                missing = self._load_from_atlas(missing, size)
+            if missing and self.disk_cache is not None:
+                missing = [path for path in missing if not self._load_cached_frame(path, size)]
+            if len(missing) >= MIN_PARALLEL_FRAMES and self.workers > 1:
+                missing = self._decode_parallel(missing, size)
+            for path in missing:
+                self._store(self._make_key(path, size), self._decode(path, size))
+
+        return [self.load(path, size, flip) for path in paths]
+
+    def _load_cached_frame(self, path: str, size: Tuple[int, int]) -> bool:
+        surface = self._load_from_disk_cache(path, size)
+        if surface is None:
+            return False
+        self._store(self._make_key(path, size), surface)
+        return True
+
+    def _find_atlas(self, directory: str) -> Optional[Atlas]:
+        if directory not in self._atlases:
+            self._atlases[directory] = find_atlas(directory, self.atlas_directory)
+        return self._atlases[directory]
+
+    def _load_from_atlas(self, paths: List[str], size: Tuple[int, int]) -> List[str]:
+        directory = os.path.dirname(paths[0])
+        if any(os.path.dirname(path) != directory for path in paths):
+            return paths
+
+        atlas = self._find_atlas(directory)
+        if atlas is None or not atlas.covers(paths, size):
+            return paths
+
+        image = self.load(atlas.image_path)
+        for path, frame in zip(paths, atlas.subsurfaces(image, paths)):
+            self._store(self._make_key(path, size), frame)
+        return []
+
+    def _decode_parallel(self, paths: List[str], size: Tuple[int, int]) -> List[str]:
+        # only reading and scaling run on the pool, the disk cache and display conversion stay on this thread
+        executor = _get_executor(self.workers)
+        for path, (surface, scaled) in zip(paths, executor.map(_read, paths, [size] * len(paths))):
+            self._store(self._make_key(path, size), self._finish_decode(path, size, surface, scaled))
+        return []
+
+    def _store(self, key: AssetKey, surface: pygame.Surface) -> pygame.Surface:
+        if self.compact and key[1] is not None:
+            surface = trim(surface)
+        self._surfaces[key] = surface
+        self._bytes += surface_bytes(surface)
+        if pygame.display.get_surface() is None:
+            self._unconverted.add(key)
+        self._evict()
+        return surface
+
+    def reload(self, path: str) -> Dict[pygame.Surface, pygame.Surface]:
+        # decodes one edited file again at every size and mirroring it is cached at, returns old surface -> new one
+        source = self._make_key(path)[0]
+        old = {key: surface for key, surface in self._surfaces.items() if key[0] == source}
+        for key, surface in old.items():
+            del self._surfaces[key]
+            self._bytes -= surface_bytes(surface)
+            self._unconverted.discard(key)
+
+        try:
+            # unmirrored first, mirrors are flipped from them
+            new = {key: self.load(*key) for key in sorted(old, key=lambda key: key[2])}
+        except (pygame.error, OSError):
+            # e.g. a file still being written, the old frames stay until the next attempt
+            for key, surface in old.items():
+                if key in self._surfaces:
+                    self._bytes -= surface_bytes(self._surfaces[key])
+                self._surfaces[key] = surface
+                self._bytes += surface_bytes(surface)
+            raise
+        return {old[key]: surface for key, surface in new.items()}
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and len(self._surfaces) > 1:
+            key, surface = self._surfaces.popitem(last=False)
+            self._bytes -= surface_bytes(surface)
+            self._unconverted.discard(key)
+
+    def convert_all(self):
+        # called once a display exists, e.g. for sprites prewarmed in the background behind the menu
+        if pygame.display.get_surface() is None or not self._unconverted:
+            return
+
+        keys = [key for key in self._surfaces if key in self._unconverted]
+        # whole surfaces first, so atlas frames can be cut again from their converted sheet
+        keys.sort(key=lambda key: self._surfaces[key].get_parent() is not None)
+        converted: Dict[int, pygame.Surface] = {}
+        # holding the originals keeps their ids from being reused while `converted` is keyed by them
+        originals = []
+        for key in keys:
+            surface = self._surfaces[key]
+            originals.append(surface)
+            parent = surface.get_parent()
+            if parent is None:
+                new = carry_trim(surface, self._convert(surface))
+            else:
+                if id(parent) not in converted:
+                    originals.append(parent)
+                    converted[id(parent)] = self._convert(parent)
+                new = converted[id(parent)].subsurface(pygame.Rect(surface.get_offset(), surface.get_size()))
+            converted[id(surface)] = new
+            self._bytes += surface_bytes(new) - surface_bytes(surface)
+            self._surfaces[key] = new
+        self._unconverted.clear()
+
+    def clear(self):
+        self._surfaces.clear()
+        self._unconverted.clear()
+        self._bytes = 0
+
+
+asset_cache = AssetCache()
+
+
+class LazyFrames(Sequence):
+    def __init__(self, count: int, loader: Callable[[int], pygame.Surface]):
+        self._frames: List[Optional[pygame.Surface]] = [None] * count
+        self._loader = loader
+
+    def __len__(self):
+        return len(self._frames)
+
+    def __getitem__(self, i: int) -> pygame.Surface:
+        frame = self._frames[i]
+        if frame is None:
+            frame = self._frames[i] = self._loader(i % len(self._frames))
+        return frame
+
+    @property
+    def loaded(self) -> int:
+        return sum(frame is not None for frame in self._frames)
+
+    def loaded_frames(self) -> List[pygame.Surface]:
+        return [frame for frame in self._frames if frame is not None]
+
+    def invalidate(self, i: int):
+        # loaded again on next access
+        self._frames[i] = None
+
+    def prewarm(self):
+        for i in range(len(self._frames)):
+            self[i]
+
+
+def sequence_paths(start_value: int, count_frames: int, pattern_name: str,
+                   max_number_len: Optional[int] = None) -> List[str]:
     if max_number_len is None:
         max_number_len = len(str(start_value+count_frames))
 
-    return list(map(
-        lambda i: pygame.transform.scale(pygame.image.load(
-            pattern_name.format(str(i).zfill(max_number_len))), size_image),
-        range(start_value, start_value+count_frames)
-    ))
+    return [pattern_name.format(str(i).zfill(max_number_len)) for i in range(start_value, start_value+count_frames)]
+
+
+def pygame_load_image(start_value: int, count_frames: int, pattern_name: str, size_image: Tuple[int, int],
+                      max_number_len: Optional[int] = None, flip: bool = False,
+                      cache: Optional[AssetCache] = None):
+    cache = asset_cache if cache is None else cache
+
+    return cache.load_many(sequence_paths(start_value, count_frames, pattern_name, max_number_len), size_image, flip)
+
+
+def pygame_load_mirror(start_value: int, count_frames: int, pattern_name: str, size_image: Tuple[int, int],
+                       max_number_len: Optional[int] = None, cache: Optional[AssetCache] = None):
+    cache = asset_cache if cache is None else cache
+    paths = sequence_paths(start_value, count_frames, pattern_name, max_number_len)
+
+    return (cache.load_many(paths, size_image),
+            LazyFrames(len(paths), lambda i: cache.load(paths[i], size_image, flip=True)))